@@ -1,18 +1,84 @@
 from flask import Flask, render_template, redirect, url_for
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
 import os
+import threading
+import time
 
 app = Flask(__name__)
 
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that counts checkouts and timeouts and records how long
+    successful checkouts waited for a connection (exposed by
+    /udeservering/api/pool)."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self._checkouts = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except exc.TimeoutError:
+            # Not a checkout: counted apart, and kept out of the wait figures.
+            with self._stats_lock:
+                self._timeouts += 1
+            raise
+        else:
+            waited = time.perf_counter() - start
+            with self._stats_lock:
+                self._checkouts += 1
+                self._wait_total += waited
+                self._wait_max = max(self._wait_max, waited)
+            return conn
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "wait_seconds_total": round(self._wait_total, 6),
+                "wait_seconds_max": round(self._wait_max, 6),
+                "wait_seconds_avg": round(self._wait_total / self._checkouts, 6) if self._checkouts else 0.0,
+            }
+
+
+def _env_int(name, default):
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+
 # --- Create and store DB engine globally ---
 def get_engine():
     conn_str = os.getenv("BrugAarhusSQL")
     if not conn_str:
         raise RuntimeError("Environment variable BrugAarhusSQL is not set.")
-    return create_engine(conn_str)
+
+    # Per worker process: pool_size + max_overflow connections at most.
+    options = {
+        "poolclass": TimedQueuePool,
+        "pool_size": _env_int("BrugAarhusSQL_POOL_SIZE", 5),
+        "max_overflow": _env_int("BrugAarhusSQL_MAX_OVERFLOW", 10),
+        "pool_timeout": _env_int("BrugAarhusSQL_POOL_TIMEOUT", 30),
+        "pool_recycle": _env_int("BrugAarhusSQL_POOL_RECYCLE", 1800),
+        "pool_pre_ping": os.getenv("BrugAarhusSQL_POOL_PRE_PING", "1") != "0",
+    }
+    if make_url(conn_str).get_driver_name() == "pyodbc":
+        # Bulk UPDATEs (PrisBeregnet, parametre) go as one batch, not row by row.
+        options["fast_executemany"] = True
+    return create_engine(conn_str, **options)
 
 engine = get_engine()
-app.config["ENGINE"] = engine  
+app.config["ENGINE"] = engine
+# Autocommit view of the same pool, for read-only code (get_read_engine).
+app.config["READ_ENGINE"] = engine.execution_options(isolation_level="AUTOCOMMIT")
 
 # --- Register Blueprints ---
 from udeservering.udeservering import udeservering_bp
@@ -0,0 +1,144 @@
+/* ============================================================================
+   Migration: indexes for the access patterns Kassen's queries actually use
+   (udeservering/udeservering.py). Run after migrate_add_prisberegnet_columns
+   and migrate_add_periode_columns — the includes reference their columns.
+
+   BrugAarhus_Udeservering_Fakturalinjer
+   - IX_Fakturalinjer_Status_DatoSort     — list pages: FakturaStatus = ?
+                                            ORDER BY FakturaDatoSort, FakturaLinjeID;
+                                            includes the columns summed/counted
+                                            by the page totals
+   - IX_Fakturalinjer_Aar_Status          — FakturaAar filters (statistik,
+                                            year repricing, year_options) and
+                                            per-year/per-status aggregates
+   - IX_Fakturalinjer_DeskproID           — distinct firm counts, top tilladelser
+   - IX_Fakturalinjer_Serveringszone      — zone filter + distinct zone lists
+   - IX_Fakturalinjer_Lokation            — lokation filter + distinct lists
+
+   BrugAarhus_Udeservering
+   - IX_Udeservering_Ansogningsdato       — default tilladelser ordering
+   - IX_Udeservering_Serveringszone       — zone filter + distinct zone lists
+   - IX_Udeservering_Lokation             — lokation filter + distinct lists
+
+   Text columns only become index keys when they are not nvarchar(max) on
+   this instance; otherwise that index is skipped (see the sanity check).
+   tools/query_plans.py records the plan of every endpoint's SQL so a
+   regression (new scan, higher cost) shows up before release.
+
+   Run as a single batch in SSMS. Idempotent.
+   ============================================================================ */
+
+SET XACT_ABORT ON;
+
+/* ---------- BrugAarhus_Udeservering_Fakturalinjer ---------- */
+IF NOT EXISTS (
+    SELECT 1 FROM sys.indexes
+    WHERE name = 'IX_Fakturalinjer_Status_DatoSort'
+      AND object_id = OBJECT_ID('dbo.BrugAarhus_Udeservering_Fakturalinjer')
+)
+AND COL_LENGTH('dbo.BrugAarhus_Udeservering_Fakturalinjer', 'FakturaStatus') <> -1
+    EXEC(N'
+    CREATE INDEX IX_Fakturalinjer_Status_DatoSort
+        ON dbo.BrugAarhus_Udeservering_Fakturalinjer (FakturaStatus, FakturaDatoSort, FakturaLinjeID)
+        INCLUDE (DeskproID, Pris, PrisBeregnet);
+    ');
+
+IF NOT EXISTS (
+    SELECT 1 FROM sys.indexes
+    WHERE name = 'IX_Fakturalinjer_Aar_Status'
+      AND object_id = OBJECT_ID('dbo.BrugAarhus_Udeservering_Fakturalinjer')
+)
+AND COL_LENGTH('dbo.BrugAarhus_Udeservering_Fakturalinjer', 'FakturaStatus') <> -1
+    EXEC(N'
+    CREATE INDEX IX_Fakturalinjer_Aar_Status
+        ON dbo.BrugAarhus_Udeservering_Fakturalinjer (FakturaAar, FakturaStatus)
+        INCLUDE (FakturaMaaned, FakturaPeriode, DeskproID, Serveringszone, Lokation,
+                 Serveringsareal, Facadelaengde, Pris, PrisBeregnet);
+    ');
+
+IF NOT EXISTS (
+    SELECT 1 FROM sys.indexes
+    WHERE name = 'IX_Fakturalinjer_DeskproID'
+      AND object_id = OBJECT_ID('dbo.BrugAarhus_Udeservering_Fakturalinjer')
+)
+    EXEC(N'
+    CREATE INDEX IX_Fakturalinjer_DeskproID
+        ON dbo.BrugAarhus_Udeservering_Fakturalinjer (DeskproID)
+        INCLUDE (FakturaStatus);
+    ');
+
+IF NOT EXISTS (
+    SELECT 1 FROM sys.indexes
+    WHERE name = 'IX_Fakturalinjer_Serveringszone'
+      AND object_id = OBJECT_ID('dbo.BrugAarhus_Udeservering_Fakturalinjer')
+)
+AND COL_LENGTH('dbo.BrugAarhus_Udeservering_Fakturalinjer', 'Serveringszone') <> -1
+    EXEC(N'
+    CREATE INDEX IX_Fakturalinjer_Serveringszone
+        ON dbo.BrugAarhus_Udeservering_Fakturalinjer (Serveringszone)
+        INCLUDE (FakturaStatus, Pris);
+    ');
+
+IF NOT EXISTS (
+    SELECT 1 FROM sys.indexes
+    WHERE name = 'IX_Fakturalinjer_Lokation'
+      AND object_id = OBJECT_ID('dbo.BrugAarhus_Udeservering_Fakturalinjer')
+)
+AND COL_LENGTH('dbo.BrugAarhus_Udeservering_Fakturalinjer', 'Lokation') <> -1
+    EXEC(N'
+    CREATE INDEX IX_Fakturalinjer_Lokation
+        ON dbo.BrugAarhus_Udeservering_Fakturalinjer (Lokation)
+        INCLUDE (FakturaStatus);
+    ');
+
+/* ---------- BrugAarhus_Udeservering ---------- */
+IF NOT EXISTS (
+    SELECT 1 FROM sys.indexes
+    WHERE name = 'IX_Udeservering_Ansogningsdato'
+      AND object_id = OBJECT_ID('dbo.BrugAarhus_Udeservering')
+)
+    EXEC(N'
+    CREATE INDEX IX_Udeservering_Ansogningsdato
+        ON dbo.BrugAarhus_Udeservering (Ansogningsdato, Id)
+        INCLUDE (GaeldendeTilPeriode);
+    ');
+
+IF NOT EXISTS (
+    SELECT 1 FROM sys.indexes
+    WHERE name = 'IX_Udeservering_Serveringszone'
+      AND object_id = OBJECT_ID('dbo.BrugAarhus_Udeservering')
+)
+AND COL_LENGTH('dbo.BrugAarhus_Udeservering', 'Serveringszone') <> -1
+    EXEC(N'
+    CREATE INDEX IX_Udeservering_Serveringszone
+        ON dbo.BrugAarhus_Udeservering (Serveringszone);
+    ');
+
+IF NOT EXISTS (
+    SELECT 1 FROM sys.indexes
+    WHERE name = 'IX_Udeservering_Lokation'
+      AND object_id = OBJECT_ID('dbo.BrugAarhus_Udeservering')
+)
+AND COL_LENGTH('dbo.BrugAarhus_Udeservering', 'Lokation') <> -1
+    EXEC(N'
+    CREATE INDEX IX_Udeservering_Lokation
+        ON dbo.BrugAarhus_Udeservering (Lokation);
+    ');
+
+/* ---------- Sanity check ---------- */
+SELECT
+    t.name AS [table],
+    i.name AS [index],
+    STUFF((
+        SELECT ', ' + c.name
+        FROM sys.index_columns ic
+        JOIN sys.columns c ON c.object_id = ic.object_id AND c.column_id = ic.column_id
+        WHERE ic.object_id = i.object_id AND ic.index_id = i.index_id AND ic.is_included_column = 0
+        ORDER BY ic.key_ordinal
+        FOR XML PATH('')
+    ), 1, 2, '') AS [keys]
+FROM sys.indexes i
+JOIN sys.tables t ON t.object_id = i.object_id
+WHERE t.name IN ('BrugAarhus_Udeservering', 'BrugAarhus_Udeservering_Fakturalinjer')
+  AND i.name LIKE 'IX[_]%'
+ORDER BY t.name, i.name;
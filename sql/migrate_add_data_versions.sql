@@ -0,0 +1,132 @@
+/* ============================================================================
+   Migration: data version counters for conditional GETs. Kassen's list and
+   statistik endpoints put these in their ETag and answer 304 Not Modified
+   when nothing they read has changed since the browser's copy.
+
+   - BrugAarhus_Udeservering_DataVersion
+       Navn     varchar(32)  — 'Tilladelser', 'Fakturalinjer', 'Takster'
+       Version  bigint       — bumped once per writing statement
+
+   Triggers bump the counter for every insert, update and delete — from
+   Kassen or the refresh robot — in the writer's transaction. 'Takster'
+   covers Parametre, Takster and Saeson: a tariff edit changes the price
+   of Ny lines without touching fakturalinjer.
+
+   Updates that only maintain derived columns (PrisBeregnet* via
+   PrisBeregnetTidspunkt, SoegIndeksTidspunkt) don't count: they follow a
+   write that already bumped the version, and Kassen makes them on reads.
+
+   Run as a single batch in SSMS. Idempotent.
+   ============================================================================ */
+
+SET XACT_ABORT ON;
+BEGIN TRANSACTION;
+
+IF OBJECT_ID('dbo.BrugAarhus_Udeservering_DataVersion', 'U') IS NULL
+    CREATE TABLE dbo.BrugAarhus_Udeservering_DataVersion (
+        Navn    varchar(32) NOT NULL
+            CONSTRAINT PK_BrugAarhus_Udeservering_DataVersion PRIMARY KEY,
+        Version bigint      NOT NULL
+    );
+
+INSERT INTO dbo.BrugAarhus_Udeservering_DataVersion (Navn, Version)
+SELECT v.Navn, 1
+FROM (VALUES ('Tilladelser'), ('Fakturalinjer'), ('Takster')) v (Navn)
+WHERE NOT EXISTS (
+    SELECT 1 FROM dbo.BrugAarhus_Udeservering_DataVersion d WHERE d.Navn = v.Navn
+);
+
+COMMIT;
+
+/* ---------- Version-bumping triggers (own batches via EXEC) ---------- */
+EXEC(N'
+CREATE OR ALTER TRIGGER dbo.trg_Udeservering_DataVersion
+ON dbo.BrugAarhus_Udeservering
+AFTER INSERT, UPDATE, DELETE
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    IF NOT EXISTS (SELECT 1 FROM inserted) AND NOT EXISTS (SELECT 1 FROM deleted)
+        RETURN;
+    -- Search index bookkeeping only.
+    IF EXISTS (SELECT 1 FROM inserted) AND EXISTS (SELECT 1 FROM deleted)
+       AND UPDATE(SoegIndeksTidspunkt)
+        RETURN;
+
+    UPDATE dbo.BrugAarhus_Udeservering_DataVersion
+    SET Version = Version + 1
+    WHERE Navn = ''Tilladelser'';
+END
+');
+
+EXEC(N'
+CREATE OR ALTER TRIGGER dbo.trg_Fakturalinjer_DataVersion
+ON dbo.BrugAarhus_Udeservering_Fakturalinjer
+AFTER INSERT, UPDATE, DELETE
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    IF NOT EXISTS (SELECT 1 FROM inserted) AND NOT EXISTS (SELECT 1 FROM deleted)
+        RETURN;
+    -- PrisBeregnet refresh / stale marking or search index bookkeeping only.
+    IF EXISTS (SELECT 1 FROM inserted) AND EXISTS (SELECT 1 FROM deleted)
+       AND (UPDATE(PrisBeregnetTidspunkt) OR UPDATE(SoegIndeksTidspunkt))
+        RETURN;
+
+    UPDATE dbo.BrugAarhus_Udeservering_DataVersion
+    SET Version = Version + 1
+    WHERE Navn = ''Fakturalinjer'';
+END
+');
+
+EXEC(N'
+CREATE OR ALTER TRIGGER dbo.trg_Parametre_DataVersion
+ON dbo.BrugAarhus_Udeservering_Parametre
+AFTER INSERT, UPDATE, DELETE
+AS
+BEGIN
+    SET NOCOUNT ON;
+    IF NOT EXISTS (SELECT 1 FROM inserted) AND NOT EXISTS (SELECT 1 FROM deleted)
+        RETURN;
+    UPDATE dbo.BrugAarhus_Udeservering_DataVersion
+    SET Version = Version + 1
+    WHERE Navn = ''Takster'';
+END
+');
+
+EXEC(N'
+CREATE OR ALTER TRIGGER dbo.trg_Takster_DataVersion
+ON dbo.BrugAarhus_Udeservering_Takster
+AFTER INSERT, UPDATE, DELETE
+AS
+BEGIN
+    SET NOCOUNT ON;
+    IF NOT EXISTS (SELECT 1 FROM inserted) AND NOT EXISTS (SELECT 1 FROM deleted)
+        RETURN;
+    UPDATE dbo.BrugAarhus_Udeservering_DataVersion
+    SET Version = Version + 1
+    WHERE Navn = ''Takster'';
+END
+');
+
+EXEC(N'
+CREATE OR ALTER TRIGGER dbo.trg_Saeson_DataVersion
+ON dbo.BrugAarhus_Udeservering_Saeson
+AFTER INSERT, UPDATE, DELETE
+AS
+BEGIN
+    SET NOCOUNT ON;
+    IF NOT EXISTS (SELECT 1 FROM inserted) AND NOT EXISTS (SELECT 1 FROM deleted)
+        RETURN;
+    UPDATE dbo.BrugAarhus_Udeservering_DataVersion
+    SET Version = Version + 1
+    WHERE Navn = ''Takster'';
+END
+');
+
+/* ---------- Sanity check ---------- */
+SELECT Navn, Version
+FROM dbo.BrugAarhus_Udeservering_DataVersion
+ORDER BY Navn;
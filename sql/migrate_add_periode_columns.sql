@@ -0,0 +1,100 @@
+/* ============================================================================
+   Migration: integer month keys (YYYYMM) so period filters can use an index
+   instead of wrapping dates in DATEFROMPARTS/YEAR() or mapping the Danish
+   month name in FakturaMaaned.
+
+   BrugAarhus_Udeservering
+   - GaeldendeFraPeriode int — YYYYMM of GaeldendeFra
+   - GaeldendeTilPeriode int — YYYYMM of GaeldendeTilOgMed, NULL if open-ended
+
+   BrugAarhus_Udeservering_Fakturalinjer
+   - FakturaPeriode int      — FakturaAar * 100 + month of FakturaMaaned
+                               ("Maj" / "Maj 2026" -> 5). NULL if unknown.
+
+   All three are PERSISTED computed columns, so neither Kassen nor the
+   refresh robot has to write them. Indexes on computed columns need the
+   usual SET options (ANSI_NULLS, QUOTED_IDENTIFIER etc. ON) — SSMS defaults.
+
+   Run as a single batch in SSMS. Idempotent.
+   ============================================================================ */
+
+SET XACT_ABORT ON;
+BEGIN TRANSACTION;
+
+IF COL_LENGTH('dbo.BrugAarhus_Udeservering', 'GaeldendeFraPeriode') IS NULL
+    ALTER TABLE dbo.BrugAarhus_Udeservering
+        ADD GaeldendeFraPeriode AS (YEAR(GaeldendeFra) * 100 + MONTH(GaeldendeFra)) PERSISTED;
+
+IF COL_LENGTH('dbo.BrugAarhus_Udeservering', 'GaeldendeTilPeriode') IS NULL
+    ALTER TABLE dbo.BrugAarhus_Udeservering
+        ADD GaeldendeTilPeriode AS (YEAR(GaeldendeTilOgMed) * 100 + MONTH(GaeldendeTilOgMed)) PERSISTED;
+
+IF COL_LENGTH('dbo.BrugAarhus_Udeservering_Fakturalinjer', 'FakturaPeriode') IS NULL
+    ALTER TABLE dbo.BrugAarhus_Udeservering_Fakturalinjer
+        ADD FakturaPeriode AS (
+            FakturaAar * 100
+            + CASE LEFT(FakturaMaaned, CHARINDEX(' ', FakturaMaaned + ' ') - 1)
+                WHEN 'Januar'    THEN 1
+                WHEN 'Februar'   THEN 2
+                WHEN 'Marts'     THEN 3
+                WHEN 'April'     THEN 4
+                WHEN 'Maj'       THEN 5
+                WHEN 'Juni'      THEN 6
+                WHEN 'Juli'      THEN 7
+                WHEN 'August'    THEN 8
+                WHEN 'September' THEN 9
+                WHEN 'Oktober'   THEN 10
+                WHEN 'November'  THEN 11
+                WHEN 'December'  THEN 12
+              END
+        ) PERSISTED;
+
+COMMIT;
+
+/* ---------- Indexes (own batches via EXEC: the columns are new) ---------- */
+-- Aktive/inaktive + period filter on tilladelser.
+IF NOT EXISTS (
+    SELECT 1 FROM sys.indexes
+    WHERE name = 'IX_Udeservering_GaeldendePeriode'
+      AND object_id = OBJECT_ID('dbo.BrugAarhus_Udeservering')
+)
+    EXEC(N'
+    CREATE INDEX IX_Udeservering_GaeldendePeriode
+        ON dbo.BrugAarhus_Udeservering (GaeldendeTilPeriode, GaeldendeFraPeriode);
+    ');
+
+-- Status + month filters, month grouping and "current and earlier".
+IF NOT EXISTS (
+    SELECT 1 FROM sys.indexes
+    WHERE name = 'IX_Fakturalinjer_Status_FakturaPeriode'
+      AND object_id = OBJECT_ID('dbo.BrugAarhus_Udeservering_Fakturalinjer')
+)
+    EXEC(N'
+    CREATE INDEX IX_Fakturalinjer_Status_FakturaPeriode
+        ON dbo.BrugAarhus_Udeservering_Fakturalinjer (FakturaStatus, FakturaPeriode);
+    ');
+
+IF NOT EXISTS (
+    SELECT 1 FROM sys.indexes
+    WHERE name = 'IX_Fakturalinjer_FakturaPeriode'
+      AND object_id = OBJECT_ID('dbo.BrugAarhus_Udeservering_Fakturalinjer')
+)
+    EXEC(N'
+    CREATE INDEX IX_Fakturalinjer_FakturaPeriode
+        ON dbo.BrugAarhus_Udeservering_Fakturalinjer (FakturaPeriode);
+    ');
+
+/* ---------- Sanity check ---------- */
+SELECT
+    t.name          AS [table],
+    c.name          AS [column],
+    TYPE_NAME(c.user_type_id) AS [type],
+    c.is_nullable   AS [nullable],
+    cc.is_persisted AS [persisted]
+FROM sys.columns c
+JOIN sys.tables t ON t.object_id = c.object_id
+LEFT JOIN sys.computed_columns cc
+       ON cc.object_id = c.object_id AND cc.column_id = c.column_id
+WHERE (t.name = 'BrugAarhus_Udeservering' AND c.name IN ('GaeldendeFraPeriode', 'GaeldendeTilPeriode'))
+   OR (t.name = 'BrugAarhus_Udeservering_Fakturalinjer' AND c.name = 'FakturaPeriode')
+ORDER BY t.name, c.column_id;
@@ -0,0 +1,149 @@
+/* ============================================================================
+   Migration: persist the computed price for Ny fakturalinjer so Kassen can
+   list, filter (hide 0 kr), sort and sum "Til godkendelse" in SQL instead of
+   pricing every matching line in Python on each page click.
+
+   - PrisBeregnet decimal(12,2)        — beregn_pris belob; NULL if no zone-takst
+   - PrisBeregnetSommer bit            — sommer-takst used
+   - PrisBeregnetMinimum bit           — minimumsbeløb applied
+   - PrisBeregnetTidspunkt datetime2   — when it was computed. NULL = stale.
+
+   Pris itself is untouched and remains the authoritative, locked price set
+   at godkend. PrisBeregnet is only meaningful while FakturaStatus = 'Ny'.
+
+   The trigger marks a Ny line stale whenever one of its pricing inputs (or
+   its status) is written — by Kassen or by the refresh robot — and Kassen
+   recomputes stale lines on the next read. Triggers on Parametre, Saeson
+   (the whole year) and Takster (the year and zone code) mark the affected
+   Ny lines stale in the same transaction as a tariff edit, whether it comes
+   from Kassen, a year clone or SSMS. Existing Ny lines start out stale and
+   are filled on the first read after the migration.
+
+   Run as a single batch in SSMS. Idempotent.
+   ============================================================================ */
+
+SET XACT_ABORT ON;
+BEGIN TRANSACTION;
+
+IF COL_LENGTH('dbo.BrugAarhus_Udeservering_Fakturalinjer', 'PrisBeregnet') IS NULL
+    ALTER TABLE dbo.BrugAarhus_Udeservering_Fakturalinjer ADD PrisBeregnet decimal(12,2) NULL;
+
+IF COL_LENGTH('dbo.BrugAarhus_Udeservering_Fakturalinjer', 'PrisBeregnetSommer') IS NULL
+    ALTER TABLE dbo.BrugAarhus_Udeservering_Fakturalinjer ADD PrisBeregnetSommer bit NULL;
+
+IF COL_LENGTH('dbo.BrugAarhus_Udeservering_Fakturalinjer', 'PrisBeregnetMinimum') IS NULL
+    ALTER TABLE dbo.BrugAarhus_Udeservering_Fakturalinjer ADD PrisBeregnetMinimum bit NULL;
+
+IF COL_LENGTH('dbo.BrugAarhus_Udeservering_Fakturalinjer', 'PrisBeregnetTidspunkt') IS NULL
+    ALTER TABLE dbo.BrugAarhus_Udeservering_Fakturalinjer ADD PrisBeregnetTidspunkt datetime2(0) NULL;
+
+COMMIT;
+
+/* ---------- Stale-marking trigger (own batch via EXEC) ---------- */
+EXEC(N'
+CREATE OR ALTER TRIGGER dbo.trg_Fakturalinjer_PrisBeregnet_Stale
+ON dbo.BrugAarhus_Udeservering_Fakturalinjer
+AFTER INSERT, UPDATE
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    IF NOT (UPDATE(Serveringszone) OR UPDATE(Lokation) OR UPDATE(Serveringsareal)
+            OR UPDATE(Facadelaengde) OR UPDATE(FakturaMaaned) OR UPDATE(FakturaAar)
+            OR UPDATE(FakturaStatus))
+        RETURN;
+
+    UPDATE f
+    SET PrisBeregnetTidspunkt = NULL
+    FROM dbo.BrugAarhus_Udeservering_Fakturalinjer f
+    JOIN inserted i ON i.FakturaLinjeID = f.FakturaLinjeID
+    WHERE f.FakturaStatus = ''Ny'';
+END
+');
+
+/* ---------- Tariff edits mark the affected Ny lines stale ---------- */
+EXEC(N'
+CREATE OR ALTER TRIGGER dbo.trg_Parametre_PrisBeregnet_Stale
+ON dbo.BrugAarhus_Udeservering_Parametre
+AFTER INSERT, UPDATE, DELETE
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    UPDATE f
+    SET PrisBeregnetTidspunkt = NULL
+    FROM dbo.BrugAarhus_Udeservering_Fakturalinjer f
+    WHERE f.FakturaStatus = ''Ny''
+      AND f.PrisBeregnetTidspunkt IS NOT NULL
+      AND f.FakturaAar IN (SELECT [Year] FROM inserted UNION SELECT [Year] FROM deleted);
+END
+');
+
+EXEC(N'
+CREATE OR ALTER TRIGGER dbo.trg_Saeson_PrisBeregnet_Stale
+ON dbo.BrugAarhus_Udeservering_Saeson
+AFTER INSERT, UPDATE, DELETE
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    UPDATE f
+    SET PrisBeregnetTidspunkt = NULL
+    FROM dbo.BrugAarhus_Udeservering_Fakturalinjer f
+    WHERE f.FakturaStatus = ''Ny''
+      AND f.PrisBeregnetTidspunkt IS NOT NULL
+      AND f.FakturaAar IN (SELECT [Year] FROM inserted UNION SELECT [Year] FROM deleted);
+END
+');
+
+EXEC(N'
+CREATE OR ALTER TRIGGER dbo.trg_Takster_PrisBeregnet_Stale
+ON dbo.BrugAarhus_Udeservering_Takster
+AFTER INSERT, UPDATE, DELETE
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    -- Old and new zone code: a renamed zone changes lines in both.
+    UPDATE f
+    SET PrisBeregnetTidspunkt = NULL
+    FROM dbo.BrugAarhus_Udeservering_Fakturalinjer f
+    WHERE f.FakturaStatus = ''Ny''
+      AND f.PrisBeregnetTidspunkt IS NOT NULL
+      AND EXISTS (
+          SELECT 1
+          FROM (SELECT [Year], ZoneKode FROM inserted
+                UNION
+                SELECT [Year], ZoneKode FROM deleted) t
+          WHERE t.[Year] = f.FakturaAar
+            AND t.ZoneKode = f.Serveringszone
+      );
+END
+');
+
+/* ---------- Stale lookup (filtered: only lines waiting for a price) ---------- */
+IF NOT EXISTS (
+    SELECT 1 FROM sys.indexes
+    WHERE name = 'IX_Fakturalinjer_PrisBeregnet_Stale'
+      AND object_id = OBJECT_ID('dbo.BrugAarhus_Udeservering_Fakturalinjer')
+)
+    EXEC(N'
+    CREATE INDEX IX_Fakturalinjer_PrisBeregnet_Stale
+        ON dbo.BrugAarhus_Udeservering_Fakturalinjer (FakturaLinjeID)
+        WHERE FakturaStatus = ''Ny'' AND PrisBeregnetTidspunkt IS NULL;
+    ');
+
+/* ---------- Sanity check ---------- */
+SELECT
+    c.name        AS [column],
+    TYPE_NAME(c.user_type_id)
+        + CASE
+            WHEN TYPE_NAME(c.user_type_id) = 'decimal' THEN '(' + CAST(c.precision AS varchar) + ',' + CAST(c.scale AS varchar) + ')'
+            ELSE ''
+          END     AS [type],
+    c.is_nullable AS [nullable]
+FROM sys.columns c
+JOIN sys.tables t ON t.object_id = c.object_id
+WHERE t.name = 'BrugAarhus_Udeservering_Fakturalinjer'
+  AND c.name IN ('PrisBeregnet', 'PrisBeregnetSommer', 'PrisBeregnetMinimum', 'PrisBeregnetTidspunkt')
+ORDER BY c.column_id;
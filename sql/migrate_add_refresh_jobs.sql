@@ -0,0 +1,48 @@
+/* ============================================================================
+   Migration: jobs for the "Synkroniser" button. POST /api/run_refresh
+   records a job here and returns its id at once; a background thread in the
+   worker triggers the refresh robot and moves the job along. Kept in the
+   database so any worker can answer GET /api/run_refresh/<id>.
+
+   - BrugAarhus_Udeservering_RefreshJob
+       JobId      char(32)       — uuid4 hex
+       Status     varchar(16)    — queued, triggered, refreshing,
+                                   done, timeout, failed
+       Oprettet   datetime2      — when the button was pressed
+       Opdateret  datetime2      — last status change
+       HttpStatus int            — orchestrator response status
+       Resultat   nvarchar(max)  — orchestrator response body or error text
+
+   Run as a single batch in SSMS. Idempotent.
+   ============================================================================ */
+
+SET XACT_ABORT ON;
+BEGIN TRANSACTION;
+
+IF OBJECT_ID('dbo.BrugAarhus_Udeservering_RefreshJob', 'U') IS NULL
+    CREATE TABLE dbo.BrugAarhus_Udeservering_RefreshJob (
+        JobId      char(32)       NOT NULL
+            CONSTRAINT PK_BrugAarhus_Udeservering_RefreshJob PRIMARY KEY,
+        Status     varchar(16)    NOT NULL,
+        Oprettet   datetime2      NOT NULL
+            CONSTRAINT DF_BrugAarhus_Udeservering_RefreshJob_Oprettet DEFAULT SYSDATETIME(),
+        Opdateret  datetime2      NOT NULL
+            CONSTRAINT DF_BrugAarhus_Udeservering_RefreshJob_Opdateret DEFAULT SYSDATETIME(),
+        HttpStatus int            NULL,
+        Resultat   nvarchar(max)  NULL
+    );
+
+IF NOT EXISTS (
+    SELECT 1 FROM sys.indexes
+    WHERE name = 'IX_RefreshJob_Status'
+      AND object_id = OBJECT_ID('dbo.BrugAarhus_Udeservering_RefreshJob')
+)
+    CREATE INDEX IX_RefreshJob_Status
+        ON dbo.BrugAarhus_Udeservering_RefreshJob (Status, Opdateret);
+
+COMMIT;
+
+/* ---------- Sanity check ---------- */
+SELECT TOP 10 JobId, Status, Oprettet, Opdateret, HttpStatus
+FROM dbo.BrugAarhus_Udeservering_RefreshJob
+ORDER BY Oprettet DESC;
@@ -0,0 +1,136 @@
+/* ============================================================================
+   Migration: trigram search index for the search boxes on Tilladelser,
+   Til godkendelse / Godkendte / Faktureret / Fakturer ikke and Statistik.
+
+   The search used to be LIKE '%term%' OR'ed across 4-6 columns, which can't
+   use an index. Kassen now keeps a side table of trigrams per row:
+
+   - BrugAarhus_Udeservering_Soegeindeks
+       Kilde     char(1)      — 'T' = BrugAarhus_Udeservering (Id),
+                                'F' = BrugAarhus_Udeservering_Fakturalinjer (FakturaLinjeID)
+       Trigram   nvarchar(3)  — 3-letter slice of a normalized token
+       RaekkeId  int          — Id / FakturaLinjeID
+   - SoegIndeksTidspunkt datetime2 on both source tables — when the row's
+     trigrams were last written. NULL = stale.
+
+   Normalization happens in Kassen (lower-case, æ/ø/å folded to ae/oe/aa,
+   accents stripped, CVR also indexed as digits only), so the trigger only
+   marks rows stale when a searchable column actually changed, and cleans up
+   trigrams of deleted rows. Kassen indexes stale rows out of band (after
+   Synkroniser, `flask --app app udeservering index-search`, or a background
+   thread started by a search); until everything is indexed searches fall
+   back to the old LIKE search.
+
+   Run as a single batch in SSMS. Idempotent.
+   ============================================================================ */
+
+SET XACT_ABORT ON;
+BEGIN TRANSACTION;
+
+IF OBJECT_ID('dbo.BrugAarhus_Udeservering_Soegeindeks', 'U') IS NULL
+    CREATE TABLE dbo.BrugAarhus_Udeservering_Soegeindeks (
+        Kilde    char(1)                              NOT NULL,
+        Trigram  nvarchar(3) COLLATE Latin1_General_BIN2 NOT NULL,
+        RaekkeId int                                  NOT NULL,
+        CONSTRAINT PK_BrugAarhus_Udeservering_Soegeindeks
+            PRIMARY KEY CLUSTERED (Kilde, Trigram, RaekkeId)
+    );
+
+IF COL_LENGTH('dbo.BrugAarhus_Udeservering', 'SoegIndeksTidspunkt') IS NULL
+    ALTER TABLE dbo.BrugAarhus_Udeservering ADD SoegIndeksTidspunkt datetime2(7) NULL;
+
+IF COL_LENGTH('dbo.BrugAarhus_Udeservering_Fakturalinjer', 'SoegIndeksTidspunkt') IS NULL
+    ALTER TABLE dbo.BrugAarhus_Udeservering_Fakturalinjer ADD SoegIndeksTidspunkt datetime2(7) NULL;
+
+COMMIT;
+
+/* ---------- Stale-marking triggers (own batches via EXEC) ---------- */
+EXEC(N'
+CREATE OR ALTER TRIGGER dbo.trg_Udeservering_Soegeindeks_Stale
+ON dbo.BrugAarhus_Udeservering
+AFTER INSERT, UPDATE, DELETE
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    DELETE s
+    FROM dbo.BrugAarhus_Udeservering_Soegeindeks s
+    JOIN deleted d ON d.Id = s.RaekkeId
+    WHERE s.Kilde = ''T''
+      AND NOT EXISTS (SELECT 1 FROM inserted i WHERE i.Id = d.Id);
+
+    UPDATE t
+    SET SoegIndeksTidspunkt = NULL
+    FROM dbo.BrugAarhus_Udeservering t
+    JOIN inserted i ON i.Id = t.Id
+    LEFT JOIN deleted d ON d.Id = i.Id
+    WHERE t.SoegIndeksTidspunkt IS NOT NULL
+      AND (d.Id IS NULL
+           OR EXISTS (SELECT i.Firmanavn, i.Adresse, i.CVR, i.Att, i.Serveringszone, i.Lokation
+                      EXCEPT
+                      SELECT d.Firmanavn, d.Adresse, d.CVR, d.Att, d.Serveringszone, d.Lokation));
+END
+');
+
+EXEC(N'
+CREATE OR ALTER TRIGGER dbo.trg_Fakturalinjer_Soegeindeks_Stale
+ON dbo.BrugAarhus_Udeservering_Fakturalinjer
+AFTER INSERT, UPDATE, DELETE
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    DELETE s
+    FROM dbo.BrugAarhus_Udeservering_Soegeindeks s
+    JOIN deleted d ON d.FakturaLinjeID = s.RaekkeId
+    WHERE s.Kilde = ''F''
+      AND NOT EXISTS (SELECT 1 FROM inserted i WHERE i.FakturaLinjeID = d.FakturaLinjeID);
+
+    UPDATE f
+    SET SoegIndeksTidspunkt = NULL
+    FROM dbo.BrugAarhus_Udeservering_Fakturalinjer f
+    JOIN inserted i ON i.FakturaLinjeID = f.FakturaLinjeID
+    LEFT JOIN deleted d ON d.FakturaLinjeID = i.FakturaLinjeID
+    WHERE f.SoegIndeksTidspunkt IS NOT NULL
+      AND (d.FakturaLinjeID IS NULL
+           OR EXISTS (SELECT i.Firmanavn, i.Adresse, i.DeskproID, i.CVR, i.Att
+                      EXCEPT
+                      SELECT d.Firmanavn, d.Adresse, d.DeskproID, d.CVR, d.Att));
+END
+');
+
+/* ---------- Stale lookups (filtered: only rows waiting to be indexed) ---------- */
+IF NOT EXISTS (
+    SELECT 1 FROM sys.indexes
+    WHERE name = 'IX_Udeservering_Soegeindeks_Stale'
+      AND object_id = OBJECT_ID('dbo.BrugAarhus_Udeservering')
+)
+    EXEC(N'
+    CREATE INDEX IX_Udeservering_Soegeindeks_Stale
+        ON dbo.BrugAarhus_Udeservering (Id)
+        WHERE SoegIndeksTidspunkt IS NULL;
+    ');
+
+IF NOT EXISTS (
+    SELECT 1 FROM sys.indexes
+    WHERE name = 'IX_Fakturalinjer_Soegeindeks_Stale'
+      AND object_id = OBJECT_ID('dbo.BrugAarhus_Udeservering_Fakturalinjer')
+)
+    EXEC(N'
+    CREATE INDEX IX_Fakturalinjer_Soegeindeks_Stale
+        ON dbo.BrugAarhus_Udeservering_Fakturalinjer (FakturaLinjeID)
+        WHERE SoegIndeksTidspunkt IS NULL;
+    ');
+
+/* ---------- Sanity check ---------- */
+SELECT
+    t.name        AS [table],
+    c.name        AS [column],
+    TYPE_NAME(c.user_type_id) AS [type],
+    c.is_nullable AS [nullable]
+FROM sys.columns c
+JOIN sys.tables t ON t.object_id = c.object_id
+WHERE (t.name IN ('BrugAarhus_Udeservering', 'BrugAarhus_Udeservering_Fakturalinjer')
+       AND c.name = 'SoegIndeksTidspunkt')
+   OR t.name = 'BrugAarhus_Udeservering_Soegeindeks'
+ORDER BY t.name, c.column_id;
@@ -0,0 +1,162 @@
+/* ============================================================================
+   Migration: monthly rollup of fakturalinjer for the statistik dashboard, so
+   KPIs, breakdowns and the monthly trend don't rescan the whole table on
+   every filter change. Run after migrate_add_periode_columns (FakturaPeriode).
+
+   - BrugAarhus_Udeservering_StatistikRollup
+       key:  FakturaAar, FakturaPeriode, Serveringszone, Lokation, FakturaStatus
+       Antal    int            — number of lines
+       SumPris  decimal(18,2)  — SUM(Pris), the stored price (NULL counted as 0)
+
+   The trigger applies the +/- delta of every insert, update and delete on
+   fakturalinjer in the same transaction — whether the write comes from
+   Kassen (update, bulk_status, bulk_godkend, reset, reset_bulk) or the
+   refresh robot. Writes that touch neither the key columns nor Pris
+   (PrisBeregnet, search index) are ignored.
+
+   dbo.usp_BrugAarhus_Udeservering_RebuildStatistikRollup recomputes it from
+   scratch (also: flask --app app udeservering rebuild-rollup). It is run
+   once at the end of this script; schedule it after the nightly refresh.
+
+   Run as a single batch in SSMS. Idempotent.
+   ============================================================================ */
+
+SET XACT_ABORT ON;
+BEGIN TRANSACTION;
+
+IF OBJECT_ID('dbo.BrugAarhus_Udeservering_StatistikRollup', 'U') IS NULL
+    CREATE TABLE dbo.BrugAarhus_Udeservering_StatistikRollup (
+        RollupId       int IDENTITY(1,1) NOT NULL
+            CONSTRAINT PK_BrugAarhus_Udeservering_StatistikRollup PRIMARY KEY,
+        FakturaAar     int             NULL,
+        FakturaPeriode int             NULL,
+        Serveringszone nvarchar(4000)  NULL,
+        Lokation       nvarchar(4000)  NULL,
+        FakturaStatus  nvarchar(4000)  NULL,
+        Antal          int             NOT NULL,
+        SumPris        decimal(18,2)   NOT NULL
+    );
+
+IF NOT EXISTS (
+    SELECT 1 FROM sys.indexes
+    WHERE name = 'IX_StatistikRollup_Aar_Periode'
+      AND object_id = OBJECT_ID('dbo.BrugAarhus_Udeservering_StatistikRollup')
+)
+    CREATE INDEX IX_StatistikRollup_Aar_Periode
+        ON dbo.BrugAarhus_Udeservering_StatistikRollup (FakturaAar, FakturaPeriode)
+        INCLUDE (Antal, SumPris);
+
+COMMIT;
+
+/* ---------- Delta-maintaining trigger (own batch via EXEC) ---------- */
+EXEC(N'
+CREATE OR ALTER TRIGGER dbo.trg_Fakturalinjer_StatistikRollup
+ON dbo.BrugAarhus_Udeservering_Fakturalinjer
+AFTER INSERT, UPDATE, DELETE
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    DECLARE @delta TABLE (
+        FakturaAar     int             NULL,
+        FakturaPeriode int             NULL,
+        Serveringszone nvarchar(4000)  NULL,
+        Lokation       nvarchar(4000)  NULL,
+        FakturaStatus  nvarchar(4000)  NULL,
+        Antal          int             NOT NULL,
+        SumPris        decimal(18,2)   NOT NULL
+    );
+
+    -- New values count +1, old values -1; unchanged rows are skipped.
+    INSERT INTO @delta
+    SELECT FakturaAar, FakturaPeriode, Serveringszone, Lokation, FakturaStatus,
+           SUM(Antal), SUM(SumPris)
+    FROM (
+        SELECT i.FakturaAar, i.FakturaPeriode, i.Serveringszone, i.Lokation, i.FakturaStatus,
+               1 AS Antal, COALESCE(i.Pris, 0) AS SumPris
+        FROM inserted i
+        LEFT JOIN deleted d ON d.FakturaLinjeID = i.FakturaLinjeID
+        WHERE d.FakturaLinjeID IS NULL
+           OR EXISTS (SELECT i.FakturaAar, i.FakturaPeriode, i.Serveringszone, i.Lokation, i.FakturaStatus, i.Pris
+                      EXCEPT
+                      SELECT d.FakturaAar, d.FakturaPeriode, d.Serveringszone, d.Lokation, d.FakturaStatus, d.Pris)
+        UNION ALL
+        SELECT d.FakturaAar, d.FakturaPeriode, d.Serveringszone, d.Lokation, d.FakturaStatus,
+               -1, -COALESCE(d.Pris, 0)
+        FROM deleted d
+        LEFT JOIN inserted i ON i.FakturaLinjeID = d.FakturaLinjeID
+        WHERE i.FakturaLinjeID IS NULL
+           OR EXISTS (SELECT i.FakturaAar, i.FakturaPeriode, i.Serveringszone, i.Lokation, i.FakturaStatus, i.Pris
+                      EXCEPT
+                      SELECT d.FakturaAar, d.FakturaPeriode, d.Serveringszone, d.Lokation, d.FakturaStatus, d.Pris)
+    ) x
+    GROUP BY FakturaAar, FakturaPeriode, Serveringszone, Lokation, FakturaStatus;
+
+    IF NOT EXISTS (SELECT 1 FROM @delta)
+        RETURN;
+
+    -- NULL-safe key match via INTERSECT.
+    UPDATE r
+    SET Antal   = r.Antal + x.Antal,
+        SumPris = r.SumPris + x.SumPris
+    FROM dbo.BrugAarhus_Udeservering_StatistikRollup r
+    JOIN @delta x
+      ON EXISTS (SELECT r.FakturaAar, r.FakturaPeriode, r.Serveringszone, r.Lokation, r.FakturaStatus
+                 INTERSECT
+                 SELECT x.FakturaAar, x.FakturaPeriode, x.Serveringszone, x.Lokation, x.FakturaStatus);
+
+    INSERT INTO dbo.BrugAarhus_Udeservering_StatistikRollup
+        (FakturaAar, FakturaPeriode, Serveringszone, Lokation, FakturaStatus, Antal, SumPris)
+    SELECT x.FakturaAar, x.FakturaPeriode, x.Serveringszone, x.Lokation, x.FakturaStatus, x.Antal, x.SumPris
+    FROM @delta x
+    WHERE NOT EXISTS (
+        SELECT 1
+        FROM dbo.BrugAarhus_Udeservering_StatistikRollup r WITH (UPDLOCK, HOLDLOCK)
+        WHERE EXISTS (SELECT r.FakturaAar, r.FakturaPeriode, r.Serveringszone, r.Lokation, r.FakturaStatus
+                      INTERSECT
+                      SELECT x.FakturaAar, x.FakturaPeriode, x.Serveringszone, x.Lokation, x.FakturaStatus)
+    );
+
+    DELETE FROM dbo.BrugAarhus_Udeservering_StatistikRollup
+    WHERE Antal <= 0;
+END
+');
+
+/* ---------- Full rebuild ---------- */
+EXEC(N'
+CREATE OR ALTER PROCEDURE dbo.usp_BrugAarhus_Udeservering_RebuildStatistikRollup
+AS
+BEGIN
+    SET NOCOUNT ON;
+    SET XACT_ABORT ON;
+
+    BEGIN TRANSACTION;
+
+    -- Read the lines first (held until commit), then replace the rollup:
+    -- same lock order as the trigger, so writers wait instead of deadlocking.
+    SELECT FakturaAar, FakturaPeriode, Serveringszone, Lokation, FakturaStatus,
+           COUNT(*) AS Antal, COALESCE(SUM(Pris), 0) AS SumPris
+    INTO #rollup
+    FROM dbo.BrugAarhus_Udeservering_Fakturalinjer WITH (TABLOCK, HOLDLOCK)
+    GROUP BY FakturaAar, FakturaPeriode, Serveringszone, Lokation, FakturaStatus;
+
+    DELETE FROM dbo.BrugAarhus_Udeservering_StatistikRollup WITH (TABLOCKX);
+
+    INSERT INTO dbo.BrugAarhus_Udeservering_StatistikRollup
+        (FakturaAar, FakturaPeriode, Serveringszone, Lokation, FakturaStatus, Antal, SumPris)
+    SELECT FakturaAar, FakturaPeriode, Serveringszone, Lokation, FakturaStatus, Antal, SumPris
+    FROM #rollup;
+
+    COMMIT;
+END
+');
+
+EXEC dbo.usp_BrugAarhus_Udeservering_RebuildStatistikRollup;
+
+/* ---------- Sanity check: rollup totals must equal the table ---------- */
+SELECT
+    (SELECT COUNT(*) FROM dbo.BrugAarhus_Udeservering_Fakturalinjer)                AS [lines],
+    (SELECT SUM(Antal) FROM dbo.BrugAarhus_Udeservering_StatistikRollup)            AS [rollup_lines],
+    (SELECT COALESCE(SUM(Pris), 0) FROM dbo.BrugAarhus_Udeservering_Fakturalinjer)  AS [sum_pris],
+    (SELECT SUM(SumPris) FROM dbo.BrugAarhus_Udeservering_StatistikRollup)          AS [rollup_sum_pris],
+    (SELECT COUNT(*) FROM dbo.BrugAarhus_Udeservering_StatistikRollup)              AS [rollup_rows];
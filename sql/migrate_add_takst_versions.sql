@@ -0,0 +1,126 @@
+/* ============================================================================
+   Migration: per-year tariff version, so every Kassen worker notices a
+   parametre / takster / saeson edit — not only the one that handled it.
+
+   - BrugAarhus_Udeservering_TakstVersion
+       Year     int     — tariff year
+       Version  bigint  — bumped once per writing statement that touches
+                          that year in Parametre, Takster or Saeson
+
+   Each worker keeps a compiled PriceTable per year, tagged with the version
+   it was built from. A request that prices reads this (tiny) table once
+   and recompiles only the years whose version moved. Edits made directly
+   in SSMS are picked up the same way.
+
+   Run as a single batch in SSMS. Idempotent.
+   ============================================================================ */
+
+SET XACT_ABORT ON;
+BEGIN TRANSACTION;
+
+IF OBJECT_ID('dbo.BrugAarhus_Udeservering_TakstVersion', 'U') IS NULL
+    CREATE TABLE dbo.BrugAarhus_Udeservering_TakstVersion (
+        [Year]  int    NOT NULL
+            CONSTRAINT PK_BrugAarhus_Udeservering_TakstVersion PRIMARY KEY,
+        Version bigint NOT NULL
+    );
+
+INSERT INTO dbo.BrugAarhus_Udeservering_TakstVersion ([Year], Version)
+SELECT y.[Year], 1
+FROM (
+    SELECT [Year] FROM dbo.BrugAarhus_Udeservering_Parametre
+    UNION
+    SELECT [Year] FROM dbo.BrugAarhus_Udeservering_Takster
+    UNION
+    SELECT [Year] FROM dbo.BrugAarhus_Udeservering_Saeson
+) y
+WHERE y.[Year] IS NOT NULL
+  AND NOT EXISTS (
+      SELECT 1 FROM dbo.BrugAarhus_Udeservering_TakstVersion v WHERE v.[Year] = y.[Year]
+  );
+
+COMMIT;
+
+/* ---------- Version-bumping triggers (own batches via EXEC) ---------- */
+EXEC(N'
+CREATE OR ALTER TRIGGER dbo.trg_Parametre_TakstVersion
+ON dbo.BrugAarhus_Udeservering_Parametre
+AFTER INSERT, UPDATE, DELETE
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    UPDATE v
+    SET Version = v.Version + 1
+    FROM dbo.BrugAarhus_Udeservering_TakstVersion v
+    WHERE v.[Year] IN (SELECT [Year] FROM inserted UNION SELECT [Year] FROM deleted);
+
+    -- First row of a new year.
+    INSERT INTO dbo.BrugAarhus_Udeservering_TakstVersion ([Year], Version)
+    SELECT y.[Year], 1
+    FROM (SELECT [Year] FROM inserted UNION SELECT [Year] FROM deleted) y
+    WHERE y.[Year] IS NOT NULL
+      AND NOT EXISTS (
+          SELECT 1
+          FROM dbo.BrugAarhus_Udeservering_TakstVersion v WITH (UPDLOCK, HOLDLOCK)
+          WHERE v.[Year] = y.[Year]
+      );
+END
+');
+
+EXEC(N'
+CREATE OR ALTER TRIGGER dbo.trg_Takster_TakstVersion
+ON dbo.BrugAarhus_Udeservering_Takster
+AFTER INSERT, UPDATE, DELETE
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    UPDATE v
+    SET Version = v.Version + 1
+    FROM dbo.BrugAarhus_Udeservering_TakstVersion v
+    WHERE v.[Year] IN (SELECT [Year] FROM inserted UNION SELECT [Year] FROM deleted);
+
+    -- First row of a new year.
+    INSERT INTO dbo.BrugAarhus_Udeservering_TakstVersion ([Year], Version)
+    SELECT y.[Year], 1
+    FROM (SELECT [Year] FROM inserted UNION SELECT [Year] FROM deleted) y
+    WHERE y.[Year] IS NOT NULL
+      AND NOT EXISTS (
+          SELECT 1
+          FROM dbo.BrugAarhus_Udeservering_TakstVersion v WITH (UPDLOCK, HOLDLOCK)
+          WHERE v.[Year] = y.[Year]
+      );
+END
+');
+
+EXEC(N'
+CREATE OR ALTER TRIGGER dbo.trg_Saeson_TakstVersion
+ON dbo.BrugAarhus_Udeservering_Saeson
+AFTER INSERT, UPDATE, DELETE
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    UPDATE v
+    SET Version = v.Version + 1
+    FROM dbo.BrugAarhus_Udeservering_TakstVersion v
+    WHERE v.[Year] IN (SELECT [Year] FROM inserted UNION SELECT [Year] FROM deleted);
+
+    -- First row of a new year.
+    INSERT INTO dbo.BrugAarhus_Udeservering_TakstVersion ([Year], Version)
+    SELECT y.[Year], 1
+    FROM (SELECT [Year] FROM inserted UNION SELECT [Year] FROM deleted) y
+    WHERE y.[Year] IS NOT NULL
+      AND NOT EXISTS (
+          SELECT 1
+          FROM dbo.BrugAarhus_Udeservering_TakstVersion v WITH (UPDLOCK, HOLDLOCK)
+          WHERE v.[Year] = y.[Year]
+      );
+END
+');
+
+/* ---------- Sanity check ---------- */
+SELECT [Year], Version
+FROM dbo.BrugAarhus_Udeservering_TakstVersion
+ORDER BY [Year];
@@ -0,0 +1,633 @@
+"""Time Kassen's heavy endpoints against synthetic data at a fixed scale.
+
+Two steps, both against a local stand-in database — a SQL Server instance
+(Docker, LocalDB, ...); the endpoints use T-SQL (OPENJSON, GROUPING SETS,
+#temp tables, triggers) that SQLite can't run:
+
+    python tools/benchmark.py generate --url "mssql+pyodbc://..." --scale 100k
+    python tools/benchmark.py run --url "mssql+pyodbc://..." --out bench.json
+    python tools/benchmark.py run --url "mssql+pyodbc://..." --baseline bench.json
+
+`generate` drops and recreates the Kassen tables, fills them with seeded
+random tilladelser, fakturalinjer across statuses and years, takster,
+saeson and parametre (10k, 100k or 1m lines), runs the migrations in sql/
+and warms PrisBeregnet and the search index, so every run starts from the
+same state. The same --scale and --seed always give the same data.
+
+`run` calls each scenario through the Flask test client (--warmup untimed
+calls, then --repeat timed ones) and writes per-scenario wall time (min /
+median / p95 / max) plus the median db / pricing / serialize split from the
+Server-Timing header to JSON. Compared against an earlier run, a scenario
+whose median got slower than the tolerance allows is reported and the exit
+code is 1.
+
+The URL can also come from BrugAarhusSQL_STANDIN. Never point this at
+production: `generate` drops the tables, and `run` approves and reverts lines.
+"""
+import argparse
+import datetime
+import itertools
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+from flask import Flask
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from udeservering import udeservering as kassen  # noqa: E402
+
+SCALES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+# Run in this order after the base tables exist.
+MIGRATIONS = [
+    "migrate_add_saeson_columns.sql",
+    "migrate_add_prisberegnet_columns.sql",
+    "migrate_add_periode_columns.sql",
+    "migrate_add_search_index.sql",
+    "migrate_add_covering_indexes.sql",
+    "migrate_add_statistik_rollup.sql",
+    "migrate_add_data_versions.sql",
+    "migrate_add_takst_versions.sql",
+    "migrate_add_refresh_jobs.sql",
+]
+
+# Dropped by `generate`; the migrations recreate the first four.
+TABLES = [
+    "BrugAarhus_Udeservering_TakstVersion",
+    "BrugAarhus_Udeservering_DataVersion",
+    "BrugAarhus_Udeservering_StatistikRollup",
+    "BrugAarhus_Udeservering_Soegeindeks",
+    "BrugAarhus_Udeservering_Fakturalinjer",
+    "BrugAarhus_Udeservering",
+    "BrugAarhus_Udeservering_Parametre",
+    "BrugAarhus_Udeservering_Takster",
+    "BrugAarhus_Udeservering_Saeson",
+]
+
+BASE_SCHEMA = [
+    """
+    CREATE TABLE dbo.BrugAarhus_Udeservering (
+        Id                int            NOT NULL PRIMARY KEY,
+        DeskproID         int            NULL,
+        Firmanavn         nvarchar(200)  NULL,
+        Adresse           nvarchar(200)  NULL,
+        CVR               nvarchar(20)   NULL,
+        Att               nvarchar(200)  NULL,
+        Geo               nvarchar(100)  NULL,
+        Serveringszone    nvarchar(50)   NULL,
+        Lokation          nvarchar(100)  NULL,
+        LokationOptionId  int            NULL,
+        Ansogningsdato    date           NULL,
+        Serveringsareal   decimal(10,2)  NULL,
+        Facadelaengde     decimal(10,2)  NULL,
+        GaeldendeFra      date           NULL,
+        GaeldendeTilOgMed date           NULL
+    )
+    """,
+    """
+    CREATE TABLE dbo.BrugAarhus_Udeservering_Fakturalinjer (
+        FakturaLinjeID  int IDENTITY(1,1) NOT NULL PRIMARY KEY,
+        DeskproID       int            NULL,
+        Firmanavn       nvarchar(200)  NULL,
+        Adresse         nvarchar(200)  NULL,
+        CVR             nvarchar(20)   NULL,
+        Att             nvarchar(200)  NULL,
+        Serveringszone  nvarchar(50)   NULL,
+        Lokation        nvarchar(100)  NULL,
+        Serveringsareal decimal(10,2)  NULL,
+        Facadelaengde   decimal(10,2)  NULL,
+        FakturaMaaned   nvarchar(50)   NULL,
+        FakturaAar      int            NULL,
+        FakturaDatoSort date           NULL,
+        Pris            decimal(12,2)  NULL,
+        FakturaStatus   nvarchar(50)   NULL,
+        Kommentar       nvarchar(1000) NULL,
+        Ansogningsdato  date           NULL
+    )
+    """,
+    """
+    CREATE TABLE dbo.BrugAarhus_Udeservering_Parametre (
+        Noegle        nvarchar(100)  NOT NULL,
+        VaerdiDecimal decimal(18,4)  NULL,
+        VaerdiTekst   nvarchar(200)  NULL,
+        [Year]        int            NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE dbo.BrugAarhus_Udeservering_Takster (
+        Id              int IDENTITY(1,1) NOT NULL PRIMARY KEY,
+        ZoneKode        nvarchar(50)   NULL,
+        ZoneBeskrivelse nvarchar(200)  NULL,
+        PSPElment       nvarchar(50)   NULL,
+        MaterialeNr     nvarchar(50)   NULL,
+        SommerPrisPrM2  decimal(10,2)  NULL,
+        VinterPrisPrM2  decimal(10,2)  NULL,
+        [Year]          int            NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE dbo.BrugAarhus_Udeservering_Saeson (
+        Id          int IDENTITY(1,1) NOT NULL PRIMARY KEY,
+        MaanedNr    int            NOT NULL,
+        Maanedsnavn nvarchar(20)   NOT NULL,
+        Saeson      nvarchar(20)   NOT NULL,
+        [Year]      int            NOT NULL
+    )
+    """,
+]
+
+MONTH_NAMES = list(kassen.MONTH_ORDER)
+SOMMER_MONTHS = range(4, 10)
+
+# (ZoneKode, beskrivelse, sommer kr/m2, vinter kr/m2) at the first year;
+# later years are indexed up a few percent.
+ZONES = [
+    ("1", "Zone 1 - Midtbyen", 37.53, 12.11),
+    ("2", "Zone 2 - Brokvartererne", 21.70, 7.05),
+    ("3", "Zone 3 - Øvrige", 10.85, 3.55),
+]
+LOKATIONER = [
+    (kassen.OPT_LOKATION_FACADE, "Facade og nærliggende areal", 0.75),
+    (kassen.OPT_LOKATION_TORV, "Nærliggende torv/plads", 0.15),
+    (kassen.OPT_LOKATION_PARKLET, "Parklet", 0.10),
+]
+PARAMETRE = [
+    ("Facadebredde i meter", 0.8),
+    ("Minimums opkrævningsareal", 1.0),
+    ("Minimums opkrævningsbeløb", 250.0),
+]
+
+FIRMA_TYPER = ["Café", "Restaurant", "Bar", "Vinbar", "Pizzeria", "Bageriet", "Kaffebaren", "Bistro"]
+FIRMA_NAVNE = ["Åen", "Hjørnet", "Latinerkvarteret", "Møllestien", "Frederiksbjerg", "Havnen",
+               "Solsiden", "Trøjborg", "Kaktus", "Gaffa", "Sct. Clemens", "Nordlys"]
+GADER = ["Søndergade", "Jægergårdsgade", "Mejlgade", "Frederiksgade", "Åboulevarden", "Vestergade",
+         "Klostergade", "Skolegade", "Banegårdspladsen", "Bruuns Gade", "Guldsmedgade", "Nørregade"]
+KOMMENTARER = ["Afventer opmåling", "Ændret areal efter tilsyn", "Lukket i perioden", "Ny ejer"]
+
+INSERT_CHUNK = 5000
+
+
+def _cvr(rnd, valid=True):
+    """Random 8-digit CVR; passes the mod-11 check unless valid=False."""
+    while True:
+        digits = [rnd.randint(1, 9)] + [rnd.randint(0, 9) for _ in range(6)]
+        check = -sum(d * w for d, w in zip(digits, (2, 7, 6, 5, 4, 3, 2))) % 11
+        if check < 10:
+            if not valid:
+                check = (check + 1) % 10
+            return "".join(map(str, digits + [check]))
+
+
+def _pris(takster, parametre, zone, is_facade, areal, facade, month):
+    """Same rule as beregn_pris, for the locked Pris of non-Ny lines."""
+    sommer, vinter = takster[zone]
+    rate = sommer if month in SOMMER_MONTHS else vinter
+    brutto = max(areal, parametre["Minimums opkrævningsareal"])
+    netto = max(brutto - facade * parametre["Facadebredde i meter"], 0) if is_facade else brutto
+    return round(max(netto * rate, parametre["Minimums opkrævningsbeløb"]), 2)
+
+
+def _status(rnd, periode, today):
+    """Faktureret in the past, approved or waiting in the last two months,
+    Ny from this month on — with the odd exception either way."""
+    months_ago = (today.year * 12 + today.month) - (periode // 100 * 12 + periode % 100)
+    r = rnd.random()
+    if months_ago > 2:
+        return "Faktureret" if r < 0.90 else "FakturerIkke" if r < 0.95 else "TilFakturering"
+    if months_ago > 0:
+        return "TilFakturering" if r < 0.45 else "Ny" if r < 0.95 else "FakturerIkke"
+    return "Ny" if r < 0.97 else "FakturerIkke"
+
+
+def generate_reference_data(today):
+    """(takster, saeson, parametre) rows for the last three years and this one,
+    plus {year: {zone: (sommer, vinter)}} for pricing the lines."""
+    years = list(range(today.year - 3, today.year + 1))
+    rates, takster, saeson, parametre = {}, [], [], []
+    for i, year in enumerate(years):
+        index = 1.03 ** i
+        rates[year] = {}
+        for kode, beskrivelse, sommer, vinter in ZONES:
+            rates[year][kode] = (round(sommer * index, 2), round(vinter * index, 2))
+            takster.append({
+                "ZoneKode": kode, "ZoneBeskrivelse": beskrivelse,
+                "PSPElment": f"XG-5101000{kode}-0000{kode}", "MaterialeNr": f"8000{kode}",
+                "SommerPrisPrM2": rates[year][kode][0], "VinterPrisPrM2": rates[year][kode][1],
+                "Year": year,
+            })
+        for m, navn in enumerate(MONTH_NAMES, start=1):
+            saeson.append({"MaanedNr": m, "Maanedsnavn": navn,
+                           "Saeson": "Sommer" if m in SOMMER_MONTHS else "Vinter", "Year": year})
+        for noegle, vaerdi in PARAMETRE:
+            parametre.append({"Noegle": noegle, "VaerdiDecimal": vaerdi, "VaerdiTekst": None, "Year": year})
+    return takster, saeson, parametre, rates
+
+
+def generate_lines(n_lines, seed, today, rates, tilladelser):
+    """Yield n_lines fakturalinjer, one per billable month of each tilladelse;
+    the tilladelser are appended to `tilladelser` as they are created."""
+    rnd = random.Random(seed)
+    years = sorted(rates)
+    param_values = dict(PARAMETRE)
+    first = datetime.date(years[0], 1, 1)
+    last = datetime.date(years[-1], 12, 1)
+    count = 0
+    while count < n_lines:
+        tid = len(tilladelser) + 1
+        option_id, lokation = rnd.choices(
+            [(o, l) for o, l, _ in LOKATIONER], weights=[w for _, _, w in LOKATIONER])[0]
+        fra = datetime.date(rnd.randint(years[0] - 1, years[-1]), rnd.randint(1, 12), 1)
+        til = None if rnd.random() < 0.6 else fra + datetime.timedelta(days=rnd.randint(90, 1100))
+        t = {
+            "Id": tid,
+            "DeskproID": 100000 + tid,
+            "Firmanavn": f"{rnd.choice(FIRMA_TYPER)} {rnd.choice(FIRMA_NAVNE)} {tid}",
+            "Adresse": f"{rnd.choice(GADER)} {rnd.randint(1, 120)}, 8000 Aarhus C",
+            "CVR": _cvr(rnd, valid=rnd.random() > 0.02),
+            "Att": "Ansøger",
+            "Geo": f"56.{rnd.randint(140000, 170000)},10.{rnd.randint(190000, 220000)}",
+            "Serveringszone": rnd.choices([z[0] for z in ZONES], weights=[5, 3, 2])[0],
+            "Lokation": lokation,
+            "LokationOptionId": option_id,
+            "Ansogningsdato": fra - datetime.timedelta(days=rnd.randint(14, 120)),
+            "Serveringsareal": 0 if rnd.random() < 0.03 else round(rnd.uniform(2, 80), 1),
+            "Facadelaengde": round(rnd.uniform(0, 15), 1) if option_id == kassen.OPT_LOKATION_FACADE else 0,
+            "GaeldendeFra": fra,
+            "GaeldendeTilOgMed": til,
+        }
+        tilladelser.append(t)
+        is_facade = option_id == kassen.OPT_LOKATION_FACADE
+
+        # Billable months: the summer season, plus some winter months for a third.
+        winter = set(rnd.sample([1, 2, 3, 10, 11, 12], rnd.randint(1, 6))) if rnd.random() < 0.33 else set()
+        month = max(fra, first)
+        end = min(til, last) if til else last
+        while month <= end and count < n_lines:
+            m = month.month
+            if m in SOMMER_MONTHS or m in winter:
+                status = _status(rnd, month.year * 100 + m, today)
+                count += 1
+                yield {
+                    "DeskproID": t["DeskproID"], "Firmanavn": t["Firmanavn"], "Adresse": t["Adresse"],
+                    "CVR": t["CVR"], "Att": t["Att"], "Serveringszone": t["Serveringszone"],
+                    "Lokation": t["Lokation"], "Serveringsareal": t["Serveringsareal"],
+                    "Facadelaengde": t["Facadelaengde"],
+                    "FakturaMaaned": MONTH_NAMES[m - 1], "FakturaAar": month.year, "FakturaDatoSort": month,
+                    "Pris": None if status == "Ny" else _pris(
+                        rates[month.year], param_values, t["Serveringszone"], is_facade,
+                        t["Serveringsareal"], t["Facadelaengde"], m),
+                    "FakturaStatus": status,
+                    "Kommentar": rnd.choice(KOMMENTARER) if rnd.random() < 0.02 else None,
+                    "Ansogningsdato": t["Ansogningsdato"],
+                }
+            month = datetime.date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def _insert(conn, table, rows):
+    """INSERT an iterable of dicts in chunks of INSERT_CHUNK; returns the count."""
+    rows = iter(rows)
+    count = 0
+    sql = None
+    while True:
+        chunk = list(itertools.islice(rows, INSERT_CHUNK))
+        if not chunk:
+            return count
+        if sql is None:
+            sql = text(
+                f"INSERT INTO dbo.{table} ({', '.join(f'[{c}]' for c in chunk[0])}) "
+                f"VALUES ({', '.join(f':{c}' for c in chunk[0])})"
+            )
+        conn.execute(sql, chunk)
+        count += len(chunk)
+
+
+def run_sql_file(engine, path):
+    """Run a migration as one batch, draining every result set so an error
+    late in the batch isn't swallowed."""
+    with open(path, encoding="utf-8") as f:
+        sql = f.read()
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        cur = conn.connection.cursor()
+        try:
+            cur.execute(sql)
+            while cur.nextset():
+                pass
+        finally:
+            cur.close()
+
+
+def make_app(engine):
+    app = Flask(__name__)
+    app.config["ENGINE"] = engine
+    app.register_blueprint(kassen.udeservering_bp, url_prefix="/udeservering")
+    return app
+
+
+def generate(engine, n_lines, seed):
+    today = datetime.date.today()
+    start = time.perf_counter()
+    takster, saeson, parametre, rates = generate_reference_data(today)
+    tilladelser = []
+
+    with engine.begin() as conn:
+        for table in TABLES:
+            conn.execute(text(f"DROP TABLE IF EXISTS dbo.{table}"))
+        for ddl in BASE_SCHEMA:
+            conn.execute(text(ddl))
+        _insert(conn, "BrugAarhus_Udeservering_Parametre", parametre)
+        _insert(conn, "BrugAarhus_Udeservering_Takster", takster)
+        _insert(conn, "BrugAarhus_Udeservering_Saeson", saeson)
+        lines = _insert(conn, "BrugAarhus_Udeservering_Fakturalinjer",
+                        generate_lines(n_lines, seed, today, rates, tilladelser))
+        _insert(conn, "BrugAarhus_Udeservering", tilladelser)
+    print(f"{len(tilladelser)} tilladelser, {lines} fakturalinjer inserted "
+          f"({time.perf_counter() - start:.1f}s)")
+
+    for name in MIGRATIONS:
+        run_sql_file(engine, os.path.join(ROOT, "sql", name))
+        print(f"{name} ({time.perf_counter() - start:.1f}s)")
+
+    # Price the Ny lines and build the search index now, so the first timed
+    # request doesn't pay for it.
+    with make_app(engine).app_context():
+        with engine.begin() as conn:
+            kassen._refresh_stale_prisberegnet(conn)
+        kassen.refresh_search_index()
+    print(f"PrisBeregnet and search index warmed ({time.perf_counter() - start:.1f}s)")
+
+
+# ---------------------------------------------------------------------------
+#  Scenarios
+# ---------------------------------------------------------------------------
+_this_year = datetime.date.today().year
+
+# (name, path, query args) — GET requests as the views send them.
+GET_SCENARIOS = [
+    ("fakturering_ny", "/udeservering/api/fakturering",
+     {"status": "Ny", "period_filter": "current_and_earlier"}),
+    ("fakturering_ny_hide_zero_sort_pris", "/udeservering/api/fakturering",
+     {"status": "Ny", "hide_zero": "1", "sort": "Pris", "order": "desc"}),
+    ("fakturering_ny_search", "/udeservering/api/fakturering", {"status": "Ny", "search": "gade"}),
+    ("fakturering_faktureret_year", "/udeservering/api/fakturering",
+     {"status": "Faktureret", "year": _this_year - 1}),
+    ("fakturering_grouped_ny", "/udeservering/api/fakturering/grouped",
+     {"status": "Ny", "group_order": "asc", "format": "columnar"}),
+    ("statistik_filtered", "/udeservering/api/statistik/filtered", {}),
+    ("statistik_filtered_year", "/udeservering/api/statistik/filtered", {"year": _this_year - 1}),
+    ("statistik_filtered_search", "/udeservering/api/statistik/filtered", {"search": "gade"}),
+    ("statistik_csv", "/udeservering/api/statistik/csv", {}),
+    ("statistik_csv_year", "/udeservering/api/statistik/csv", {"year": _this_year - 1}),
+]
+
+BEREGN_PRIS_BODY = {
+    "Zone": "1", "Lokation": "Facade og nærliggende areal",
+    "LokationOptionId": kassen.OPT_LOKATION_FACADE,
+    "Serveringsareal": 24, "Facadelaengde": 6, "Month": 6, "Year": _this_year,
+}
+
+
+def _server_timing(header):
+    """{"db": ms, "pricing": ms, ...} from a Server-Timing header."""
+    timings = {}
+    for part in (header or "").split(","):
+        fields = part.strip().split(";")
+        for field in fields[1:]:
+            if field.startswith("dur="):
+                timings[fields[0]] = float(field[4:])
+    return timings
+
+
+class Runner:
+    def __init__(self, engine, accept_encoding):
+        self.engine = engine
+        self.app = make_app(engine)
+        self.client = self.app.test_client()
+        self.headers = {"Accept-Encoding": accept_encoding} if accept_encoding else {}
+
+    def _request(self, method, path, **kwargs):
+        start = time.perf_counter()
+        resp = self.client.open(path, method=method, headers=self.headers, **kwargs)
+        body = resp.get_data()   # drains streamed responses (CSV) inside the timing
+        elapsed = (time.perf_counter() - start) * 1000
+        if resp.status_code != 200:
+            raise RuntimeError(f"{method} {path} returned {resp.status_code}: {body[:200]!r}")
+        return elapsed, _server_timing(resp.headers.get("Server-Timing")), len(body)
+
+    def get(self, path, args):
+        return lambda: self._request("GET", path, query_string=args)
+
+    def beregn_pris(self):
+        return lambda: self._request("POST", "/udeservering/api/beregn_pris", json=BEREGN_PRIS_BODY)
+
+    def beregn_pris_batch(self, n):
+        """beregn_pris_batch over the pricing columns of n fakturalinjer."""
+        with self.engine.connect() as conn:
+            rows = conn.execute(text(f"""
+                SELECT TOP (:n) Serveringszone, Lokation, Serveringsareal, Facadelaengde,
+                       FakturaMaaned, FakturaAar
+                FROM BrugAarhus_Udeservering_Fakturalinjer
+                ORDER BY FakturaLinjeID
+            """), {"n": n}).mappings().all()
+        columns = (
+            [r["Serveringszone"] for r in rows],
+            [r["Lokation"] for r in rows],
+            [r["Serveringsareal"] for r in rows],
+            [r["Facadelaengde"] for r in rows],
+            [kassen.MONTH_ORDER.get(r["FakturaMaaned"], 0) for r in rows],
+            [r["FakturaAar"] for r in rows],
+        )
+
+        def call():
+            with self.app.app_context():
+                start = time.perf_counter()
+                kassen.beregn_pris_batch(*columns)
+                return (time.perf_counter() - start) * 1000, {}, 0
+        return call
+
+    def bulk_godkend(self, n):
+        """Approve n Ny lines with a valid CVR and a price; each call is
+        undone (status, Pris, PrisBeregnet) outside the timing."""
+        with self.engine.connect() as conn:
+            rows = conn.execute(text("""
+                SELECT TOP (:n) FakturaLinjeID, CVR, Pris
+                FROM BrugAarhus_Udeservering_Fakturalinjer
+                WHERE FakturaStatus = 'Ny' AND PrisBeregnet > 0
+                ORDER BY FakturaDatoSort, FakturaLinjeID
+            """), {"n": n * 2}).mappings().all()
+        rows = [r for r in rows if kassen.is_valid_cvr(r["CVR"])][:n]
+        if len(rows) < n:
+            raise RuntimeError(f"bulk_godkend: only {len(rows)} approvable Ny lines, need {n}")
+        ids = [r["FakturaLinjeID"] for r in rows]
+        restore = [{"id": r["FakturaLinjeID"], "pris": r["Pris"]} for r in rows]
+
+        def call():
+            try:
+                return self._request("POST", "/udeservering/api/fakturering/bulk_godkend", json={"ids": ids})
+            finally:
+                with self.app.app_context(), self.engine.begin() as conn:
+                    conn.execute(text("""
+                        UPDATE BrugAarhus_Udeservering_Fakturalinjer
+                        SET FakturaStatus = 'Ny', Pris = :pris
+                        WHERE FakturaLinjeID = :id
+                    """), restore)
+                    kassen._refresh_stale_prisberegnet(conn)
+        return call
+
+    def scenarios(self, batch):
+        for name, path, args in GET_SCENARIOS:
+            yield name, self.get(path, args)
+        yield "beregn_pris", self.beregn_pris()
+        yield f"beregn_pris_batch_{batch}", self.beregn_pris_batch(batch)
+        yield f"bulk_godkend_{batch}", self.bulk_godkend(batch)
+
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def measure(call, warmup, repeat):
+    for _ in range(warmup):
+        call()
+    runs = [call() for _ in range(repeat)]
+    wall = [ms for ms, _, _ in runs]
+    result = {
+        "runs": repeat,
+        "min_ms": round(min(wall), 2),
+        "median_ms": round(statistics.median(wall), 2),
+        "p95_ms": round(_percentile(wall, 0.95), 2),
+        "max_ms": round(max(wall), 2),
+        "bytes": runs[-1][2],
+    }
+    for phase in ("db", "pricing", "serialize"):
+        values = [timings[phase] for _, timings, _ in runs if phase in timings]
+        if values:
+            result[f"{phase}_ms"] = round(statistics.median(values), 2)
+    return result
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(engine, warmup, repeat, batch, accept_encoding, only=None):
+    with engine.connect() as conn:
+        lines, tilladelser = conn.execute(text("""
+            SELECT (SELECT COUNT(*) FROM BrugAarhus_Udeservering_Fakturalinjer),
+                   (SELECT COUNT(*) FROM BrugAarhus_Udeservering)
+        """)).one()
+
+    results = {}
+    for name, call in Runner(engine, accept_encoding).scenarios(batch):
+        if only and name not in only:
+            continue
+        results[name] = measure(call, warmup, repeat)
+        print(f"{name:40} median {results[name]['median_ms']:9.1f} ms   p95 {results[name]['p95_ms']:9.1f} ms")
+
+    return {
+        "meta": {
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "fakturalinjer": lines,
+            "tilladelser": tilladelser,
+            "warmup": warmup,
+            "repeat": repeat,
+            "accept_encoding": accept_encoding,
+        },
+        "scenarios": results,
+    }
+
+
+def compare(current, baseline, tolerance):
+    """List of regression messages: median above baseline * (1 + tolerance)."""
+    problems = []
+    for name, cur in current["scenarios"].items():
+        base = baseline["scenarios"].get(name)
+        if base is None:
+            continue
+        ratio = cur["median_ms"] / base["median_ms"] if base["median_ms"] else 1.0
+        print(f"{name:40} {base['median_ms']:9.1f} -> {cur['median_ms']:9.1f} ms   x{ratio:.2f}")
+        if ratio > 1 + tolerance:
+            problems.append(f"{name}: median {base['median_ms']} ms -> {cur['median_ms']} ms")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--url", default=os.getenv("BrugAarhusSQL_STANDIN"),
+                        help="SQLAlchemy URL of the stand-in database")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    gen = sub.add_parser("generate", help="(re)create the tables with synthetic data")
+    gen.add_argument("--scale", default="10k",
+                     help="number of fakturalinjer: 10k, 100k, 1m or a plain number (default 10k)")
+    gen.add_argument("--seed", type=int, default=1, help="random seed (default 1)")
+
+    bench = sub.add_parser("run", help="time the scenarios")
+    bench.add_argument("--out", default="bench_output.json", help="where to write this run")
+    bench.add_argument("--baseline", help="earlier run to compare against")
+    bench.add_argument("--tolerance", type=float, default=0.2,
+                       help="allowed relative increase of the median (default 0.2 = +20%%)")
+    bench.add_argument("--warmup", type=int, default=2, help="untimed calls per scenario (default 2)")
+    bench.add_argument("--repeat", type=int, default=10, help="timed calls per scenario (default 10)")
+    bench.add_argument("--batch", type=int, default=500,
+                       help="lines per bulk_godkend / beregn_pris_batch call (default 500)")
+    bench.add_argument("--accept-encoding", default="gzip",
+                       help="Accept-Encoding sent with every request (default gzip; '' for none)")
+    bench.add_argument("--only", nargs="+", help="run only these scenarios")
+    args = parser.parse_args(argv)
+
+    if not args.url:
+        parser.error("--url or BrugAarhusSQL_STANDIN is required")
+    if args.url == os.getenv("BrugAarhusSQL"):
+        parser.error("refusing to run against BrugAarhusSQL — use a stand-in database")
+
+    options = {}
+    if make_url(args.url).get_driver_name() == "pyodbc":
+        options["fast_executemany"] = True
+    engine = create_engine(args.url, **options)
+
+    if args.command == "generate":
+        try:
+            n_lines = SCALES.get(args.scale.lower()) or int(args.scale)
+        except ValueError:
+            parser.error(f"--scale must be one of {', '.join(SCALES)} or a number")
+        generate(engine, n_lines, args.seed)
+        return 0
+
+    current = run(engine, args.warmup, args.repeat, args.batch, args.accept_encoding, args.only)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(current, f, indent=2, ensure_ascii=False)
+    print(f"{len(current['scenarios'])} scenarios recorded in {args.out}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline["meta"].get("fakturalinjer") != current["meta"]["fakturalinjer"]:
+            print(f"WARNING baseline has {baseline['meta'].get('fakturalinjer')} fakturalinjer, "
+                  f"this run {current['meta']['fakturalinjer']} — not the same data")
+        problems = compare(current, baseline, args.tolerance)
+        for p in problems:
+            print("REGRESSION", p)
+        if problems:
+            return 1
+        print("No regressions against", args.baseline)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
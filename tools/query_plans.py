@@ -0,0 +1,252 @@
+"""Record the estimated plan of every SQL statement Kassen's read endpoints run.
+
+Calls a fixed list of GET endpoints on the udeservering blueprint with the
+engine pointed at a local stand-in database — a SQL Server instance (Docker,
+LocalDB, ...) with the tables, the migrations in sql/ and representative
+data — captures each SELECT the endpoint sends, and asks SQL Server for its
+SHOWPLAN_XML. Per statement the estimated cost and any full scans
+(Table Scan / Clustered Index Scan) of the Kassen tables are written to JSON.
+
+Compared against an earlier run, a statement that gains a full scan or gets
+noticeably more expensive is reported and the exit code is 1, so a filter
+that can't use an index is caught before release:
+
+    python tools/query_plans.py --url "mssql+pyodbc://..." --out plans.json
+    python tools/query_plans.py --url "mssql+pyodbc://..." --baseline plans.json
+
+The URL can also come from BrugAarhusSQL_STANDIN. Never point this at
+production: a search on a stale index starts indexing it.
+"""
+import argparse
+import datetime
+import decimal
+import hashlib
+import json
+import os
+import sys
+import xml.etree.ElementTree as ET
+
+from flask import Flask
+from sqlalchemy import create_engine, event
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from udeservering.udeservering import (  # noqa: E402
+    invalidate_filter_options, refresh_search_index, udeservering_bp,
+)
+
+SHOWPLAN_NS = {"p": "http://schemas.microsoft.com/sqlserver/2004/07/showplan"}
+
+# Tables where a full scan is a regression.
+WATCHED_TABLES = {
+    "BrugAarhus_Udeservering",
+    "BrugAarhus_Udeservering_Fakturalinjer",
+    "BrugAarhus_Udeservering_Soegeindeks",
+}
+FULL_SCANS = {"Table Scan", "Clustered Index Scan"}
+
+_this_year = datetime.date.today().year
+
+# (name, path, query args) — one per filter combination the views send.
+SCENARIOS = [
+    ("tilladelser_default", "/udeservering/api/tilladelser", {}),
+    ("tilladelser_alle_sort_firmanavn", "/udeservering/api/tilladelser",
+     {"filter": "alle", "sort": "Firmanavn", "order": "asc"}),
+    ("tilladelser_inaktive", "/udeservering/api/tilladelser", {"filter": "inaktive"}),
+    ("tilladelser_search", "/udeservering/api/tilladelser", {"search": "gade"}),
+    ("tilladelser_zone", "/udeservering/api/tilladelser", {"zone": "1"}),
+    ("tilladelser_year_month", "/udeservering/api/tilladelser",
+     {"year": _this_year, "month": "Maj"}),
+    ("tilladelser_cursor", "/udeservering/api/tilladelser", {"cursor": ""}),
+    ("tilladelser_filters", "/udeservering/api/applications/filters", {}),
+    ("fakturering_ny", "/udeservering/api/fakturering", {"status": "Ny"}),
+    ("fakturering_ny_hide_zero_sort_pris", "/udeservering/api/fakturering",
+     {"status": "Ny", "hide_zero": "1", "sort": "Pris"}),
+    ("fakturering_ny_current", "/udeservering/api/fakturering",
+     {"status": "Ny", "period_filter": "current_and_earlier"}),
+    ("fakturering_tilfakturering_search", "/udeservering/api/fakturering",
+     {"status": "TilFakturering", "search": "gade"}),
+    ("fakturering_faktureret_year_month", "/udeservering/api/fakturering",
+     {"status": "Faktureret", "year": _this_year, "month": "Maj"}),
+    ("fakturering_all_statuses", "/udeservering/api/fakturering", {"status": ""}),
+    ("fakturering_cursor", "/udeservering/api/fakturering", {"status": "Ny", "cursor": ""}),
+    ("fakturering_grouped_ny", "/udeservering/api/fakturering/grouped",
+     {"status": "Ny", "group_order": "asc"}),
+    ("fakturering_grouped_faktureret", "/udeservering/api/fakturering/grouped",
+     {"status": "Faktureret"}),
+    ("fakturering_year_options", "/udeservering/api/fakturering/year_options", {}),
+    ("parametre", "/udeservering/api/parametre", {"year": _this_year}),
+    ("takster", "/udeservering/api/takster", {"year": _this_year}),
+    ("saeson", "/udeservering/api/saeson", {"year": _this_year}),
+    ("statistik_table", "/udeservering/api/statistik/table", {}),
+    ("statistik_metrics", "/udeservering/api/statistik/metrics", {}),
+    ("statistik_filtered", "/udeservering/api/statistik/filtered", {}),
+    ("statistik_filtered_year", "/udeservering/api/statistik/filtered", {"year": _this_year}),
+    ("statistik_filtered_search", "/udeservering/api/statistik/filtered", {"search": "gade"}),
+    ("statistik_filter_options", "/udeservering/api/statistik/filter_options", {}),
+    ("statistik_csv", "/udeservering/api/statistik/csv", {"year": _this_year}),
+]
+
+
+def _literal(value):
+    """Render a bound parameter as a T-SQL literal (SHOWPLAN needs a plain batch)."""
+    if value is None:
+        return "NULL"
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, (int, float, decimal.Decimal)):
+        return str(value)
+    if isinstance(value, datetime.datetime):
+        return "'" + value.isoformat(sep=" ", timespec="microseconds") + "'"
+    if isinstance(value, datetime.date):
+        return "'" + value.isoformat() + "'"
+    return "N'" + str(value).replace("'", "''") + "'"
+
+
+def _inline(statement, parameters):
+    """Substitute qmark parameters into `statement`."""
+    parts = statement.split("?")
+    if len(parts) - 1 != len(parameters):
+        raise ValueError("Parameter count does not match placeholders")
+    out = [parts[0]]
+    for value, part in zip(parameters, parts[1:]):
+        out.append(_literal(value))
+        out.append(part)
+    return "".join(out)
+
+
+def capture_statements(engine):
+    """Run every scenario; returns {scenario: [sql, ...]} of the SELECTs sent."""
+    app = Flask(__name__)
+    app.config["ENGINE"] = engine
+    app.register_blueprint(udeservering_bp, url_prefix="/udeservering")
+    client = app.test_client()
+    with app.app_context():
+        # Searches on a stale index fall back to LIKE and index in the background.
+        refresh_search_index()
+
+    captured = []
+
+    def _capture(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith("SELECT"):
+            captured.append(_inline(statement, parameters or ()))
+
+    event.listen(engine, "before_cursor_execute", _capture)
+    statements = {}
+    try:
+        for name, path, args in SCENARIOS:
+            captured.clear()
+            # Filter options are cached per worker; make every scenario query.
+            invalidate_filter_options()
+            resp = client.get(path, query_string=args)
+            try:
+                # Streamed responses (CSV) only run their SELECT while the body is read.
+                resp.get_data()
+            finally:
+                resp.close()
+            if resp.status_code != 200:
+                raise RuntimeError(f"{name}: {path} returned {resp.status_code}")
+            if not captured:
+                raise RuntimeError(f"{name}: {path} ran no SELECT — nothing to check")
+            statements[name] = list(captured)
+    finally:
+        event.remove(engine, "before_cursor_execute", _capture)
+    return statements
+
+
+def explain(engine, sql):
+    """Estimated plan summary for one statement: cost and full scans."""
+    raw = engine.raw_connection()
+    try:
+        cur = raw.cursor()
+        cur.execute("SET SHOWPLAN_XML ON")
+        try:
+            cur.execute(sql)
+            plan_xml = cur.fetchone()[0]
+        finally:
+            cur.execute("SET SHOWPLAN_XML OFF")
+    finally:
+        raw.close()
+
+    root = ET.fromstring(plan_xml)
+    cost = sum(
+        float(stmt.get("StatementSubTreeCost", 0))
+        for stmt in root.iterfind(".//p:StmtSimple", SHOWPLAN_NS)
+    )
+    scans = set()
+    for relop in root.iterfind(".//p:RelOp", SHOWPLAN_NS):
+        op = relop.get("PhysicalOp")
+        if op not in FULL_SCANS:
+            continue
+        for obj in relop.iterfind("./*/p:Object", SHOWPLAN_NS):
+            table = (obj.get("Table") or "").strip("[]")
+            if table in WATCHED_TABLES:
+                scans.add(f"{table}: {op}")
+    return {"cost": round(cost, 6), "full_scans": sorted(scans)}
+
+
+def record(engine):
+    results = {}
+    for name, sqls in capture_statements(engine).items():
+        for i, sql in enumerate(sqls):
+            results[f"{name}#{i}"] = {
+                "sql_hash": hashlib.sha1(" ".join(sql.split()).encode()).hexdigest()[:12],
+                **explain(engine, sql),
+                "sql": sql,
+            }
+    return results
+
+
+def compare(current, baseline, tolerance):
+    """List of regression messages: new full scans, or cost above baseline * (1 + tolerance)."""
+    problems = []
+    for key, cur in current.items():
+        base = baseline.get(key)
+        if base is None:
+            if cur["full_scans"]:
+                problems.append(f"{key}: new statement with full scan(s) {cur['full_scans']}")
+            continue
+        new_scans = sorted(set(cur["full_scans"]) - set(base["full_scans"]))
+        if new_scans:
+            problems.append(f"{key}: new full scan(s) {new_scans}")
+        if base["cost"] and cur["cost"] > base["cost"] * (1 + tolerance):
+            problems.append(f"{key}: estimated cost {base['cost']} -> {cur['cost']}")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--url", default=os.getenv("BrugAarhusSQL_STANDIN"),
+                        help="SQLAlchemy URL of the stand-in database")
+    parser.add_argument("--out", default="query_plans.json", help="where to write this run")
+    parser.add_argument("--baseline", help="earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.5,
+                        help="allowed relative cost increase (default 0.5 = +50%%)")
+    args = parser.parse_args(argv)
+
+    if not args.url:
+        parser.error("--url or BrugAarhusSQL_STANDIN is required")
+    if args.url == os.getenv("BrugAarhusSQL"):
+        parser.error("refusing to run against BrugAarhusSQL — use a stand-in database")
+
+    engine = create_engine(args.url)
+    current = record(engine)
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(current, f, indent=2, ensure_ascii=False)
+    print(f"{len(current)} statements recorded in {args.out}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        problems = compare(current, baseline, args.tolerance)
+        for p in problems:
+            print("REGRESSION", p)
+        if problems:
+            return 1
+        print("No plan regressions against", args.baseline)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
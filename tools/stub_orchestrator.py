@@ -0,0 +1,68 @@
+"""Local stand-in for the orchestrator's trigger API, for trying the
+"Synkroniser" button (POST /udeservering/api/run_refresh) without starting
+the real refresh robot:
+
+    python tools/stub_orchestrator.py --port 5101
+    PyOrchestratorURL=http://127.0.0.1:5101/api/trigger flask --app app run
+
+Every trigger is logged and answered like the orchestrator does. --delay
+makes it slow (to see the job stay "queued"), --fail N answers the first N
+calls with 503 (to see the retries), --status answers every call with that
+status (to see a failed job).
+"""
+import argparse
+import threading
+import time
+
+from flask import Flask, jsonify, request
+
+app = Flask(__name__)
+app.config.update(DELAY=0.0, FAIL=0, STATUS=200)
+
+_lock = threading.Lock()
+_calls = []
+
+
+@app.route("/api/trigger", methods=["POST"])
+def trigger():
+    data = request.get_json(silent=True) or {}
+    with _lock:
+        _calls.append({"at": time.time(), "payload": data, "api_key": bool(request.headers.get("X-API-Key"))})
+        n = len(_calls)
+    app.logger.info("trigger #%d: %s", n, data)
+
+    time.sleep(app.config["DELAY"])
+    if n <= app.config["FAIL"]:
+        return jsonify({"error": "unavailable"}), 503
+    status = app.config["STATUS"]
+    if status >= 400:
+        return jsonify({"error": f"stub status {status}"}), status
+    return jsonify({
+        "trigger_name": data.get("trigger_name"),
+        "process_status": data.get("process_status"),
+        "message": "Trigger updated",
+    }), status
+
+
+@app.route("/api/calls")
+def calls():
+    """Triggers received so far, for checking from a test."""
+    with _lock:
+        return jsonify(list(_calls))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5101)
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds before answering")
+    parser.add_argument("--fail", type=int, default=0, help="answer the first N calls with 503")
+    parser.add_argument("--status", type=int, default=200, help="status of every other answer")
+    args = parser.parse_args(argv)
+
+    app.config.update(DELAY=args.delay, FAIL=args.fail, STATUS=args.status)
+    app.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
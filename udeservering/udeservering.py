@@ -1,12 +1,48 @@
-from flask import Blueprint, render_template, request, jsonify, current_app, Response
-from sqlalchemy import text
+from flask import Blueprint, render_template, request, current_app, Response, stream_with_context, send_file, make_response, g, has_request_context
+from flask import jsonify as _flask_jsonify
+from sqlalchemy import text, event
+from sqlalchemy.engine import Engine
+import bisect
 import datetime
+import base64
+import click
 import csv
+import decimal
+import functools
+import gzip
+import hashlib
 import io
-from functools import lru_cache
+import json
+import logging
+import re
+import tempfile
+import threading
+import time
+import unicodedata
+import uuid
+from dataclasses import dataclass
+import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import os
 
+try:
+    import xlsxwriter  # optional: XLSX export
+except ImportError:
+    xlsxwriter = None
+
+try:
+    import pyarrow as pa  # optional: Parquet export
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+try:
+    import brotli  # optional: br response compression
+except ImportError:
+    brotli = None
+
 MONTH_ORDER = {
     "Januar": 1, "Februar": 2, "Marts": 3, "April": 4,
     "Maj": 5, "Juni": 6, "Juli": 7, "August": 8,
@@ -18,8 +54,25 @@ MONTH_NAME_TO_NUM = {
 }
 
 
+def _month_num(faktura_maaned):
+    """'Maj 2026' / 'Maj' -> 5. Unknown or empty -> 0."""
+    return MONTH_NAME_TO_NUM.get((faktura_maaned or "").split(" ")[0], 0)
+
+
+# Month keys (YYYYMM), persisted on both tables by sql/migrate_add_periode_columns.sql:
+# GaeldendeFraPeriode / GaeldendeTilPeriode on tilladelser, FakturaPeriode on fakturalinjer.
+CURRENT_PERIODE_SQL = "(YEAR(GETDATE()) * 100 + MONTH(GETDATE()))"
+
+
+def _periode(year, month_num):
+    """(2026, 5) -> 202605."""
+    return int(year) * 100 + int(month_num)
+
+
 udeservering_bp = Blueprint("udeservering", __name__, template_folder="templates")
 
+log = logging.getLogger(__name__)
+
 
 # Friendly status -> page-key mapping (for active-tab highlighting in navbar)
 PAGE_KEYS = {
@@ -37,6 +90,24 @@ def get_engine():
     return current_app.config["ENGINE"]
 
 
+_read_engine_lock = threading.Lock()
+
+
+def get_read_engine():
+    """The engine in autocommit mode, for code that only reads: no transaction
+    is opened, committed or rolled back around the statements. Shares the
+    pool with get_engine(). app.py creates it next to the engine; apps that
+    only set ENGINE (the tools/ scripts) get one derived on first use."""
+    read_engine = current_app.config.get("READ_ENGINE")
+    if read_engine is None:
+        with _read_engine_lock:
+            read_engine = current_app.config.get("READ_ENGINE")
+            if read_engine is None:
+                read_engine = get_engine().execution_options(isolation_level="AUTOCOMMIT")
+                current_app.config["READ_ENGINE"] = read_engine
+    return read_engine
+
+
 def _to_decimal_or_none(val):
     """Treat empty strings as NULL for numeric fields; pass through real numbers/strings."""
     if val is None:
@@ -58,11 +129,785 @@ def is_valid_cvr(cvr) -> bool:
     return total % 11 == 0
 
 
-@lru_cache(maxsize=100)
-def load_prisdata_for_year(year: int):
-    engine = get_engine()
+# ---------------------------------------------------------------------------
+#  Metrics for the blueprint's routes, served in Prometheus text format at
+#  /udeservering/metrics. Per request, SQL statements and their time are
+#  taken from the engine's cursor events, and rows fetched / rows priced are
+#  counted where the views read and price rows; at the end of the request
+#  they are added to per-route totals. Recording is a few additions per
+#  request, and rendering only happens when /metrics is scraped. Figures are
+#  per worker process.
+#
+#  The same figures go out per response as a Server-Timing header (db,
+#  pricing, serialize), and statements slower than SLOW_QUERY_MS are logged
+#  with their parameters and the endpoint that ran them.
+# ---------------------------------------------------------------------------
+SLOW_QUERY_MS = float(os.getenv("BrugAarhusSQL_SLOW_QUERY_MS", 500))
+SLOW_QUERY_PARAMS_CHARS = 2000   # logged repr of the bound parameters is cut here
+
+METRICS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METRICS_COUNTERS = {
+    "sql_statements": ("udeservering_sql_statements_total", "SQL statements executed."),
+    "sql_seconds": ("udeservering_sql_seconds_total", "Time spent executing SQL statements."),
+    "rows_fetched": ("udeservering_rows_fetched_total", "Rows read by list, statistik and export queries."),
+    "rows_priced": ("udeservering_rows_priced_total", "Fakturalinjer priced through beregn_pris."),
+    "pricing_seconds": ("udeservering_pricing_seconds_total", "Time spent in beregn_pris / beregn_pris_batch."),
+    "serialize_seconds": ("udeservering_serialize_seconds_total", "Time spent building and compressing JSON responses."),
+}
 
-    with engine.begin() as conn:
+_metrics_lock = threading.Lock()
+_route_latency = {}    # (endpoint, method) -> [count per bucket..., +Inf, sum]
+_route_counters = {}   # (endpoint, method) -> {counter: total}
+
+
+def _metric_add(name, value=1):
+    """Add to one of METRICS_COUNTERS for the current request."""
+    if has_request_context():
+        counters = g.get("_metrics")
+        if counters is not None:
+            counters[name] = counters.get(name, 0) + value
+
+
+def _timed_phase(name):
+    """Decorator: add the function's run time to the `name` counter."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _metric_add(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+# Every view builds its JSON through this, so the time shows up as "serialize".
+jsonify = _timed_phase("serialize_seconds")(_flask_jsonify)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _metrics_sql_start(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("_metrics_sql_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _metrics_sql_end(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["_metrics_sql_start"].pop()
+    _metric_add("sql_statements")
+    _metric_add("sql_seconds", elapsed)
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        params = repr(parameters)
+        if len(params) > SLOW_QUERY_PARAMS_CHARS:
+            params = params[:SLOW_QUERY_PARAMS_CHARS] + "..."
+        log.warning(
+            "Slow query (%.0f ms) in %s: %s | params=%s",
+            elapsed * 1000,
+            request.endpoint if has_request_context() else "-",
+            " ".join(statement.split()),
+            params,
+        )
+
+
+@event.listens_for(Engine, "handle_error")
+def _metrics_sql_error(context):
+    starts = context.connection.info.get("_metrics_sql_start") if context.connection is not None else None
+    if starts:
+        starts.pop()
+
+
+@udeservering_bp.before_request
+def _metrics_start_request():
+    g._metrics = {}
+    g._metrics_start = time.perf_counter()
+
+
+@udeservering_bp.after_request
+def _server_timing(resp):
+    """Server-Timing: db / pricing / serialize / total for browser devtools.
+    Registered before _compress_response, so it runs after it."""
+    counters = g.get("_metrics")
+    if counters is None:
+        return resp
+    total = time.perf_counter() - g._metrics_start
+    resp.headers["Server-Timing"] = ", ".join([
+        f'db;dur={counters.get("sql_seconds", 0) * 1000:.1f};desc="SQL ({counters.get("sql_statements", 0)})"',
+        f'pricing;dur={counters.get("pricing_seconds", 0) * 1000:.1f}',
+        f'serialize;dur={counters.get("serialize_seconds", 0) * 1000:.1f}',
+        f"total;dur={total * 1000:.1f}",
+    ])
+    return resp
+
+
+@udeservering_bp.teardown_request
+def _metrics_end_request(exc):
+    counters = g.pop("_metrics", None)
+    if counters is None or request.endpoint == "udeservering.metrics":
+        return
+    elapsed = time.perf_counter() - g.pop("_metrics_start")
+    key = (request.endpoint or "", request.method)
+    with _metrics_lock:
+        hist = _route_latency.get(key)
+        if hist is None:
+            hist = _route_latency[key] = [0] * (len(METRICS_BUCKETS) + 1) + [0.0]
+        hist[bisect.bisect_left(METRICS_BUCKETS, elapsed)] += 1
+        hist[-1] += elapsed
+        totals = _route_counters.setdefault(key, {})
+        for name, value in counters.items():
+            totals[name] = totals.get(name, 0) + value
+
+
+def _render_metrics():
+    """All route metrics in the Prometheus text exposition format."""
+    with _metrics_lock:
+        latency = {k: list(v) for k, v in _route_latency.items()}
+        counters = {k: dict(v) for k, v in _route_counters.items()}
+
+    def labels(key, **extra):
+        pairs = [("endpoint", key[0]), ("method", key[1])] + list(extra.items())
+        return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+    lines = [
+        "# HELP udeservering_request_duration_seconds Request latency per route.",
+        "# TYPE udeservering_request_duration_seconds histogram",
+    ]
+    for key in sorted(latency):
+        hist = latency[key]
+        cumulative = 0
+        for le, n in zip(METRICS_BUCKETS + ("+Inf",), hist[:-1]):
+            cumulative += n
+            lines.append(f"udeservering_request_duration_seconds_bucket{labels(key, le=le)} {cumulative}")
+        lines.append(f"udeservering_request_duration_seconds_sum{labels(key)} {hist[-1]:.6f}")
+        lines.append(f"udeservering_request_duration_seconds_count{labels(key)} {cumulative}")
+
+    for name, (metric, help_text) in METRICS_COUNTERS.items():
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} counter")
+        for key in sorted(latency):
+            value = counters.get(key, {}).get(name, 0)
+            lines.append(f"{metric}{labels(key)} {value:.6f}" if name.endswith("_seconds")
+                         else f"{metric}{labels(key)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+# ---------------------------------------------------------------------------
+#  Id lists from the UI (bulk actions) go to SQL Server as one JSON parameter
+#  unpacked with OPENJSON, instead of one :idN placeholder per id — no 2100
+#  parameter limit, and the statement text (and its plan) is the same for
+#  any selection size.
+# ---------------------------------------------------------------------------
+def _parse_ids(ids):
+    """Validate a list of ids from a request body. Raises ValueError."""
+    if not isinstance(ids, list):
+        raise ValueError("Ugyldige IDs")
+    try:
+        return [int(i) for i in ids]
+    except (TypeError, ValueError):
+        raise ValueError("Ugyldige IDs")
+
+
+def _id_list(ids, params, name="ids"):
+    """Subquery yielding `ids`, for `col IN (...)`. Adds :name to params."""
+    params[name] = json.dumps(ids)
+    return f"SELECT CAST([value] AS int) FROM OPENJSON(:{name})"
+
+
+# ---------------------------------------------------------------------------
+#  Filter-option lookups (distinct years / zones / lokationer for the
+#  dropdowns) are cached per worker, tagged with the DataVersion counter of
+#  the table they are read from (see DATA_VERSION_TABLE). Any write to that
+#  table — the refresh robot, an edit through any worker, or a change made
+#  outside Kassen — bumps the counter, and every worker reloads on its next
+#  lookup. The TTL is only a backstop.
+# ---------------------------------------------------------------------------
+FILTER_OPTIONS_TTL = 300   # seconds
+
+_filter_options = {}             # name -> (expires, version, value)
+_filter_options_generation = 0   # bumped on every invalidation
+_filter_options_lock = threading.Lock()
+
+
+def _cached_filter_options(name, source, load):
+    """`load()`'s value for `name`, reused while `source`'s data version is
+    unchanged, until invalidated or FILTER_OPTIONS_TTL has passed."""
+    now = time.monotonic()
+    version = _data_versions().get(source)
+    hit = _filter_options.get(name)
+    if hit is not None and hit[0] > now and hit[1] == version:
+        return hit[2]
+
+    generation = _filter_options_generation
+    value = load()
+    with _filter_options_lock:
+        # Don't store a value loaded across an invalidation — it may be stale.
+        # A write during load() leaves `version` behind, so the next lookup reloads.
+        if generation == _filter_options_generation:
+            _filter_options[name] = (now + FILTER_OPTIONS_TTL, version, value)
+    return value
+
+
+def invalidate_filter_options():
+    """Drop the cached filter options in this worker; the next request
+    reloads them (tools/query_plans.py, to make every scenario query)."""
+    global _filter_options_generation
+    with _filter_options_lock:
+        _filter_options_generation += 1
+        _filter_options.clear()
+
+
+# ---------------------------------------------------------------------------
+#  Conditional GET. Triggers (sql/migrate_add_data_versions.sql) bump a
+#  counter per data source on every write, from Kassen or the robot. Views
+#  wrapped in @conditional_get send an ETag built from those counters, the
+#  current month and the query arguments, and answer 304 before running
+#  their queries when the browser's copy is still current.
+# ---------------------------------------------------------------------------
+DATA_VERSION_TABLE = "BrugAarhus_Udeservering_DataVersion"
+
+
+def _data_versions():
+    """{source: version} from DATA_VERSION_TABLE."""
+    with get_read_engine().connect() as conn:
+        return dict(conn.execute(text(f"""
+            SELECT Navn, Version FROM {DATA_VERSION_TABLE}
+        """)).fetchall())
+
+
+def _data_etag(sources):
+    """Strong ETag for the current request over the given data sources."""
+    versions = _data_versions()
+
+    today = datetime.date.today()
+    key = json.dumps([
+        request.path,
+        sorted(request.args.items(multi=True)),
+        [versions.get(name) for name in sources],
+        # "aktive" and "current and earlier" move with the calendar.
+        _periode(today.year, today.month),
+    ])
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+def conditional_get(*sources):
+    """Answer If-None-Match with 304 while none of `sources` ('Tilladelser',
+    'Fakturalinjer', 'Takster') has changed."""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            etag = _data_etag(sources)
+            # _compress_response suffixes the tag of an encoded body.
+            matched = next(
+                (tag for tag in (etag, f"{etag}-br", f"{etag}-gzip")
+                 if request.if_none_match.contains(tag)),
+                None,
+            )
+            if matched:
+                resp = Response(status=304)
+                resp.set_etag(matched)
+                resp.vary.add("Accept-Encoding")
+            else:
+                resp = make_response(view(*args, **kwargs))
+                if resp.status_code != 200:
+                    return resp
+                resp.set_etag(etag)
+            # Revalidate on every use rather than trusting a heuristic lifetime.
+            resp.headers["Cache-Control"] = "no-cache"
+            return resp
+        return wrapper
+    return decorator
+
+
+# ---------------------------------------------------------------------------
+#  Payload size. Row lists can be requested with format=columnar: the column
+#  names once plus one value array per row, instead of a dict per row. JSON
+#  responses from the blueprint are compressed (brotli if installed, else
+#  gzip) when the browser accepts it.
+# ---------------------------------------------------------------------------
+COMPRESS_MIN_BYTES = 1024
+
+
+def _columnar_requested():
+    return request.args.get("format") == "columnar"
+
+
+def _columnar(rows):
+    """(columns, data) for a list of row dicts that share their keys."""
+    columns = list(rows[0].keys()) if rows else []
+    return columns, [[r[c] for c in columns] for r in rows]
+
+
+def _rows_result(result, rows):
+    """Put `rows` in `result` as "rows", or "columns" + "data" when columnar."""
+    if _columnar_requested():
+        result["columns"], result["data"] = _columnar(rows)
+    else:
+        result["rows"] = rows
+    return result
+
+
+@udeservering_bp.after_request
+def _compress_response(resp):
+    if (resp.status_code != 200 or resp.direct_passthrough or resp.is_streamed
+            or resp.mimetype != "application/json" or "Content-Encoding" in resp.headers):
+        return resp
+    resp.vary.add("Accept-Encoding")
+    body = resp.get_data()
+    if len(body) < COMPRESS_MIN_BYTES:
+        return resp
+
+    start = time.perf_counter()
+    accepted = request.accept_encodings
+    if brotli is not None and accepted["br"]:
+        encoding, body = "br", brotli.compress(body, quality=5)
+    elif accepted["gzip"]:
+        encoding, body = "gzip", gzip.compress(body, compresslevel=6)
+    else:
+        return resp
+
+    resp.set_data(body)
+    resp.headers["Content-Encoding"] = encoding
+    _metric_add("serialize_seconds", time.perf_counter() - start)
+    etag, weak = resp.get_etag()
+    if etag:
+        # A strong ETag names one representation.
+        resp.set_etag(f"{etag}-{encoding}", weak)
+    return resp
+
+
+# ---------------------------------------------------------------------------
+#  Keyset ("seek") pagination. Opt-in on the list endpoints with `cursor`
+#  (empty for the first page); the response carries `next_cursor`, an opaque
+#  token holding the sort column, direction, and the last row's sort value
+#  and primary key. Past the first page the totals are only computed when
+#  the client asks for them with totals=1.
+# ---------------------------------------------------------------------------
+class InvalidCursor(ValueError):
+    pass
+
+
+def _encode_cursor(sort, order, value, key):
+    if isinstance(value, datetime.datetime):
+        v = ["dt", value.isoformat()]
+    elif isinstance(value, datetime.date):
+        v = ["d", value.isoformat()]
+    elif isinstance(value, decimal.Decimal):
+        v = ["n", str(value)]
+    else:
+        v = ["v", value]
+    raw = json.dumps({"s": sort, "o": order, "v": v, "k": key}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(token, sort, order):
+    """Return (value, key) from a cursor made for the same sort/order."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        c = json.loads(raw)
+        tag, v = c["v"]
+        if tag == "dt":
+            v = datetime.datetime.fromisoformat(v)
+        elif tag == "d":
+            v = datetime.date.fromisoformat(v)
+        elif tag == "n":
+            v = decimal.Decimal(v)
+        key = c["k"]
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursor("Ugyldig cursor")
+    if c.get("s") != sort or c.get("o") != order:
+        raise InvalidCursor("Cursor passer ikke til sortering")
+    return v, key
+
+
+def _seek_predicate(sort_expr, key_col, order, value, key, params, nulls_first=None):
+    """WHERE fragment selecting rows after (value, key) in
+    `ORDER BY sort_expr <order>, key_col <order>`.
+
+    SQL Server sorts NULLs first ascending and last descending; pass
+    nulls_first=False when the ORDER BY forces NULLs last."""
+    if nulls_first is None:
+        nulls_first = (order == "asc")
+    op = ">" if order == "asc" else "<"
+    params["seek_key"] = key
+    if value is None:
+        pred = f"({sort_expr} IS NULL AND {key_col} {op} :seek_key)"
+        if nulls_first:
+            pred = f"({pred} OR {sort_expr} IS NOT NULL)"
+        return pred
+    params["seek_value"] = value
+    pred = f"{sort_expr} {op} :seek_value OR ({sort_expr} = :seek_value AND {key_col} {op} :seek_key)"
+    if not nulls_first:
+        pred += f" OR {sort_expr} IS NULL"
+    return f"({pred})"
+
+
+# ---------------------------------------------------------------------------
+#  Column projections. Each view reads — and serializes — the columns it
+#  declares here instead of SELECT *, so columns the refresh robot adds later
+#  aren't shipped on every request and the covering indexes can cover.
+# ---------------------------------------------------------------------------
+# Tilladelser list (tilladelser.html); also the sortable columns.
+TILLADELSE_LIST_COLUMNS = (
+    "Id", "DeskproID", "Firmanavn", "Att", "Adresse", "CVR",
+    "Serveringszone", "Lokation", "Sommersaeson", "Vintermaaneder",
+    "Serveringsareal", "Facadelaengde",
+    "GaeldendeFra", "GaeldendeTilOgMed", "Ansogningsdato",
+)
+
+# Pricing inputs for beregn_pris_batch / _effective_prices.
+FAKTURALINJE_PRICING_COLUMNS = (
+    "FakturaLinjeID", "FakturaStatus", "Pris",
+    "Serveringszone", "Lokation", "Serveringsareal", "Facadelaengde",
+    "FakturaMaaned", "FakturaAar",
+)
+
+# Fakturalinje lists, flat and grouped. PrisBeregnet(Tidspunkt) feed
+# _with_effective_prices, FakturaPeriode the month grouping.
+FAKTURALINJE_LIST_COLUMNS = FAKTURALINJE_PRICING_COLUMNS + (
+    "DeskproID", "Firmanavn", "Att", "Adresse", "CVR", "Kommentar",
+    "FakturaDatoSort", "FakturaPeriode", "PrisBeregnet", "PrisBeregnetTidspunkt",
+)
+
+# Edit modal (/api/fakturering/<id>).
+FAKTURALINJE_DETAIL_COLUMNS = FAKTURALINJE_LIST_COLUMNS + (
+    "PrisBeregnetSommer", "PrisBeregnetMinimum",
+)
+
+
+def _select_list(columns, alias=None):
+    """`columns` as a SELECT list, optionally qualified with `alias`."""
+    prefix = f"{alias}." if alias else ""
+    return ", ".join(f"{prefix}[{col}]" for col in columns)
+
+
+# ---------------------------------------------------------------------------
+#  List pages in one round trip: the page rows and the totals over the whole
+#  filtered set come from the same statement (window aggregates over a single
+#  scan), instead of separate page / COUNT / SUM queries.
+# ---------------------------------------------------------------------------
+def _window_aggregate(kind, expr):
+    if kind == "count":
+        return "COUNT(*) OVER ()"
+    if kind == "sum":
+        return f"SUM({expr}) OVER ()"
+    if kind == "distinct":
+        # COUNT(DISTINCT ...) OVER () isn't allowed; the two dense ranks sum
+        # to the number of distinct values + 1, NULL counted as a value.
+        return (
+            f"DENSE_RANK() OVER (ORDER BY {expr} ASC)"
+            f" + DENSE_RANK() OVER (ORDER BY {expr} DESC) - 1"
+            f" - MAX(CASE WHEN {expr} IS NULL THEN 1 ELSE 0 END) OVER ()"
+        )
+    raise ValueError(kind)
+
+
+def _plain_aggregate(kind, expr):
+    if kind == "count":
+        return "COUNT(*)"
+    if kind == "sum":
+        return f"SUM({expr})"
+    if kind == "distinct":
+        return f"COUNT(DISTINCT {expr})"
+    raise ValueError(kind)
+
+
+def _fetch_page(conn, table, columns, where_sql, order_by, params, aggregates, seek_sql=None, totals=True):
+    """Fetch one list page together with totals over the filtered set.
+
+    `columns` is the view's projection; order_by and seek_sql may only use
+    those. `aggregates` maps a result name to ("count", None), ("sum", expr)
+    or ("distinct", expr). Expects :offset/:limit in params. Returns
+    (rows, totals).
+
+    With `seek_sql` (keyset mode, past the first page) the page is a plain
+    seek on the sort index, so page 400 costs what page 1 does; the totals
+    then take a separate aggregate query, only when `totals` is true, and
+    are None otherwise."""
+    if seek_sql:
+        rows = conn.execute(text(f"""
+            SELECT {_select_list(columns)}
+            FROM {table}
+            {where_sql + " AND " if where_sql else "WHERE "}({seek_sql})
+            ORDER BY {order_by}
+            OFFSET 0 ROWS FETCH NEXT :limit ROWS ONLY
+        """), params).mappings().all()
+        _metric_add("rows_fetched", len(rows))
+        page_rows = [dict(r) for r in rows]
+        return page_rows, (_plain_totals(conn, table, where_sql, params, aggregates) if totals else None)
+
+    window_cols = ",\n".join(
+        f"{_window_aggregate(kind, expr)} AS [_agg_{name}]"
+        for name, (kind, expr) in aggregates.items()
+    )
+    rows = conn.execute(text(f"""
+        SELECT *
+        FROM (
+            SELECT {_select_list(columns, "t")},
+                   {window_cols}
+            FROM {table} t
+            {where_sql}
+        ) page
+        ORDER BY {order_by}
+        OFFSET :offset ROWS FETCH NEXT :limit ROWS ONLY
+    """), params).mappings().all()
+
+    if rows:
+        first = rows[0]
+        page_totals = {name: first[f"_agg_{name}"] for name in aggregates}
+    elif not params.get("offset"):
+        # Empty first page: nothing matches the filters.
+        page_totals = {name: 0 for name in aggregates}
+    else:
+        # Paged past the end; the totals still describe the filtered set.
+        page_totals = _plain_totals(conn, table, where_sql, params, aggregates)
+
+    _metric_add("rows_fetched", len(rows))
+    page_rows = [
+        {k: v for k, v in r.items() if not k.startswith("_agg_")}
+        for r in rows
+    ]
+    return page_rows, page_totals
+
+
+def _plain_totals(conn, table, where_sql, params, aggregates):
+    plain_cols = ", ".join(
+        f"{_plain_aggregate(kind, expr)} AS [{name}]"
+        for name, (kind, expr) in aggregates.items()
+    )
+    return dict(conn.execute(text(f"""
+        SELECT {plain_cols}
+        FROM {table}
+        {where_sql}
+    """), params).mappings().first())
+
+
+# ---------------------------------------------------------------------------
+#  Search index (sql/migrate_add_search_index.sql). Each row's searchable
+#  columns are normalized and cut into trigrams in BrugAarhus_Udeservering_Soegeindeks;
+#  a search first narrows to rows holding every trigram of the term, then
+#  re-applies the original LIKEs to those candidates, so results are the same
+#  as the plain LIKE search. SoegIndeksTidspunkt IS NULL marks a row whose
+#  trigrams must be (re)written; a trigger sets it when a searchable column
+#  changes. Searches only read: stale rows are indexed out of band, by
+#  refresh_search_index (after Synkroniser, from `flask --app app udeservering
+#  index-search`, or in a background thread started by a search that found
+#  the index stale), and until then searches use LIKE.
+# ---------------------------------------------------------------------------
+SEARCH_INDEX_TABLE = "BrugAarhus_Udeservering_Soegeindeks"
+
+# Kilde -> (table, key column, indexed columns)
+SEARCH_SOURCES = {
+    "T": ("dbo.BrugAarhus_Udeservering", "Id",
+          ("Firmanavn", "Adresse", "CVR", "Att", "Serveringszone", "Lokation")),
+    "F": ("BrugAarhus_Udeservering_Fakturalinjer", "FakturaLinjeID",
+          ("Firmanavn", "Adresse", "DeskproID", "CVR", "Att")),
+}
+
+SEARCH_INDEX_BATCH = 5000   # stale rows indexed per transaction
+SEARCH_MAX_TRIGRAMS = 16    # any subset of the term's trigrams still narrows correctly
+
+_SEARCH_FOLD = str.maketrans({"æ": "ae", "ø": "oe", "å": "aa"})
+
+
+def _search_normalize(value):
+    """Lower-case, æ/ø/å -> ae/oe/aa, accents stripped."""
+    s = unicodedata.normalize("NFKD", str(value).lower().translate(_SEARCH_FOLD))
+    return "".join(ch for ch in s if not unicodedata.combining(ch))
+
+
+def _search_trigrams(value):
+    """Trigrams of the normalized tokens (letters/digits) in `value`."""
+    return {
+        tok[i:i + 3]
+        for tok in re.findall(r"[^\W_]+", _search_normalize(value))
+        for i in range(len(tok) - 2)
+    }
+
+
+def _row_trigrams(row, columns):
+    trigrams = set()
+    for col in columns:
+        val = row.get(col)
+        if val is None:
+            continue
+        trigrams |= _search_trigrams(val)
+        if col == "CVR":
+            # "12 34 56 78" is also findable as 12345678.
+            trigrams |= _search_trigrams("".join(ch for ch in str(val) if ch.isdigit()))
+    return trigrams
+
+
+def _refresh_search_index(kilde):
+    """Index up to SEARCH_INDEX_BATCH stale rows of `kilde`. Returns True when
+    no stale rows remain, i.e. the index can answer searches."""
+    table, key_col, columns = SEARCH_SOURCES[kilde]
+    stamp = datetime.datetime.now()
+
+    with get_engine().begin() as conn:
+        # Claim a batch first: the rows stay locked until commit, and a later
+        # edit sets SoegIndeksTidspunkt back to NULL.
+        conn.execute(text(f"""
+            UPDATE TOP (:batch) {table}
+            SET SoegIndeksTidspunkt = :stamp
+            WHERE SoegIndeksTidspunkt IS NULL
+        """), {"batch": SEARCH_INDEX_BATCH, "stamp": stamp})
+
+        rows = conn.execute(text(f"""
+            SELECT {key_col}, {", ".join(columns)}
+            FROM {table}
+            WHERE SoegIndeksTidspunkt = :stamp
+        """), {"stamp": stamp}).mappings().all()
+
+        if rows:
+            conn.execute(text(f"""
+                DELETE FROM {SEARCH_INDEX_TABLE}
+                WHERE Kilde = :kilde
+                  AND RaekkeId IN (SELECT {key_col} FROM {table} WHERE SoegIndeksTidspunkt = :stamp)
+            """), {"kilde": kilde, "stamp": stamp})
+
+            entries = [
+                {"kilde": kilde, "trigram": tg, "id": r[key_col]}
+                for r in rows
+                for tg in _row_trigrams(r, columns)
+            ]
+            if entries:
+                conn.execute(text(f"""
+                    INSERT INTO {SEARCH_INDEX_TABLE} (Kilde, Trigram, RaekkeId)
+                    VALUES (:kilde, :trigram, :id)
+                """), entries)
+
+        stale = conn.execute(text(f"""
+            SELECT CASE WHEN EXISTS (
+                SELECT 1 FROM {table} WHERE SoegIndeksTidspunkt IS NULL
+            ) THEN 1 ELSE 0 END
+        """)).scalar()
+
+    return not stale
+
+
+def refresh_search_index():
+    """Index every stale row of both sources, a batch per transaction."""
+    for kilde in SEARCH_SOURCES:
+        while not _refresh_search_index(kilde):
+            pass
+
+
+@udeservering_bp.cli.command("index-search")
+def refresh_search_index_command():
+    """Index stale rows for search: flask --app app udeservering index-search"""
+    refresh_search_index()
+    click.echo("Søgeindeks opdateret.")
+
+
+_search_indexing = threading.Lock()   # held while this worker's indexer runs
+
+
+def _run_search_indexing(app):
+    with app.app_context():
+        try:
+            refresh_search_index()
+        except Exception:
+            log.exception("search index refresh failed")
+        finally:
+            _search_indexing.release()
+
+
+def _start_search_indexing():
+    """Index stale rows in a background thread, unless one is running."""
+    if not _search_indexing.acquire(blocking=False):
+        return
+    threading.Thread(
+        target=_run_search_indexing,
+        args=(current_app._get_current_object(),),
+        name="search-index",
+        daemon=True,
+    ).start()
+
+
+def _search_index_fresh(kilde):
+    """True when `kilde` has no stale rows, i.e. the index can answer searches."""
+    table, _, _ = SEARCH_SOURCES[kilde]
+    with get_read_engine().connect() as conn:
+        return not conn.execute(text(f"""
+            SELECT CASE WHEN EXISTS (
+                SELECT 1 FROM {table} WHERE SoegIndeksTidspunkt IS NULL
+            ) THEN 1 ELSE 0 END
+        """)).scalar()
+
+
+def _search_clause(kilde, search, like_columns, params):
+    """WHERE fragment for the free-text search box: `search` as a substring
+    of any of `like_columns`, narrowed through the trigram index when it can
+    be used."""
+    params["search"] = f"%{search}%"
+    like_sql = "(" + " OR ".join(f"{col} LIKE :search" for col in like_columns) + ")"
+
+    # LIKE wildcards in the term, or nothing 3 letters long: plain LIKE.
+    if any(ch in search for ch in "%_["):
+        return like_sql
+    trigrams = sorted(_search_trigrams(search))[:SEARCH_MAX_TRIGRAMS]
+    if not trigrams:
+        return like_sql
+    if not _search_index_fresh(kilde):
+        _start_search_indexing()
+        return like_sql
+
+    _, key_col, _ = SEARCH_SOURCES[kilde]
+    placeholders = ", ".join(f":search_tg{i}" for i in range(len(trigrams)))
+    params.update({f"search_tg{i}": tg for i, tg in enumerate(trigrams)})
+    return f"""(
+        {key_col} IN (
+            SELECT RaekkeId
+            FROM {SEARCH_INDEX_TABLE}
+            WHERE Kilde = '{kilde}' AND Trigram IN ({placeholders})
+            GROUP BY RaekkeId
+            HAVING COUNT(*) = {len(trigrams)}
+        )
+        AND {like_sql}
+    )"""
+
+
+@dataclass(frozen=True)
+class PriceTable:
+    """Compiled, read-only tariff for one year.
+
+    Zones are interned to small ints (0 = no takst), so rates can be looked
+    up by index both from beregn_pris and from NumPy in beregn_pris_batch.
+    Instances are shared between requests and must never be mutated.
+    """
+    year: int
+    version: int
+    zone_codes: dict            # ZoneKode.upper() -> 1..n
+    sommer_rates: tuple         # index = zone code; slot 0 is NaN
+    vinter_rates: tuple
+    sommer_months: tuple        # 13 bools; index = MaanedNr, slot 0 unused
+    facadebredde: float
+    min_areal: float
+    min_belob: float
+    sommer_rates_arr: np.ndarray
+    vinter_rates_arr: np.ndarray
+    sommer_months_arr: np.ndarray
+
+
+# Per worker, each PriceTable is tagged with the year's version from
+# TAKST_VERSION_TABLE (sql/migrate_add_takst_versions.sql), which triggers
+# bump on every parametre / takster / saeson write. A request that prices
+# reads the versions once; years whose version moved — edited through any
+# worker, or directly in the database — are recompiled, the rest are reused.
+TAKST_VERSION_TABLE = "BrugAarhus_Udeservering_TakstVersion"
+
+_price_tables = {}           # year -> PriceTable
+_price_tables_lock = threading.Lock()
+
+
+def _readonly(arr):
+    arr.setflags(write=False)
+    return arr
+
+
+def _compile_price_table(year, version):
+    engine = get_read_engine()
+
+    with engine.connect() as conn:
 
         params = {
             r["Noegle"]: (r["VaerdiDecimal"] if r["VaerdiDecimal"] is not None else r["VaerdiTekst"])
@@ -73,18 +918,13 @@ def load_prisdata_for_year(year: int):
             """), {"y": year}).mappings().all()
         }
 
-        takster = {
-            r["ZoneKode"].upper(): dict(r)
-            for r in conn.execute(text("""
-                SELECT ZoneKode,
-                       SommerPrisPrM2,
-                       VinterPrisPrM2,
-                       PSPElment,
-                       MaterialeNr
-                FROM BrugAarhus_Udeservering_Takster
-                WHERE [Year] = :y
-            """), {"y": year}).mappings().all()
-        }
+        takster = conn.execute(text("""
+            SELECT ZoneKode,
+                   SommerPrisPrM2,
+                   VinterPrisPrM2
+            FROM BrugAarhus_Udeservering_Takster
+            WHERE [Year] = :y
+        """), {"y": year}).mappings().all()
 
         saeson = {
             r["MaanedNr"]: r["Saeson"]
@@ -95,11 +935,77 @@ def load_prisdata_for_year(year: int):
             """), {"y": year}).mappings().all()
         }
 
-    return {
-        "params": params,
-        "takster": takster,
-        "saeson": saeson
-    }
+    # A zone without both rates behaves as "takst ikke fundet".
+    zone_codes = {}
+    sommer_rates = [float("nan")]
+    vinter_rates = [float("nan")]
+    for t in takster:
+        if t["ZoneKode"] is None or t["SommerPrisPrM2"] is None or t["VinterPrisPrM2"] is None:
+            continue
+        zone_codes[t["ZoneKode"].upper()] = len(sommer_rates)
+        sommer_rates.append(float(t["SommerPrisPrM2"]))
+        vinter_rates.append(float(t["VinterPrisPrM2"]))
+
+    sommer_months = tuple(saeson.get(m) == "Sommer" for m in range(13))
+
+    return PriceTable(
+        year=year,
+        version=version,
+        zone_codes=zone_codes,
+        sommer_rates=tuple(sommer_rates),
+        vinter_rates=tuple(vinter_rates),
+        sommer_months=sommer_months,
+        facadebredde=float(params.get("Facadebredde i meter", 0.8)),
+        min_areal=float(params.get("Minimums opkrævningsareal", 1.0)),
+        min_belob=float(params.get("Minimums opkrævningsbeløb", 250.0)),
+        sommer_rates_arr=_readonly(np.array(sommer_rates, dtype=float)),
+        vinter_rates_arr=_readonly(np.array(vinter_rates, dtype=float)),
+        sommer_months_arr=_readonly(np.array(sommer_months, dtype=bool)),
+    )
+
+
+def _takst_versions():
+    """{year: version} from TAKST_VERSION_TABLE; read once per request."""
+    if has_request_context() and "_takst_versions" in g:
+        return g._takst_versions
+    with get_read_engine().connect() as conn:
+        versions = dict(conn.execute(text(f"""
+            SELECT [Year], Version FROM {TAKST_VERSION_TABLE}
+        """)).all())
+    if has_request_context():
+        g._takst_versions = versions
+    return versions
+
+
+def get_price_table(year):
+    """The compiled PriceTable for `year`, rebuilt when the year's version in
+    the database differs from the one it was compiled from."""
+    if year is not None:
+        year = int(year)
+    # Version first, tariff second: a write in between only costs one more
+    # recompile on the next request, never a stale table under a new version.
+    version = _takst_versions().get(year, 0)
+    table = _price_tables.get(year)
+    if table is not None and table.version == version:
+        return table
+    with _price_tables_lock:
+        table = _price_tables.get(year)
+        if table is None or table.version != version:
+            table = _compile_price_table(year, version)
+            _price_tables[year] = table
+    return table
+
+
+def reload_price_table(year):
+    """Recompile the PriceTable for one year after its parametre/takster/saeson
+    changed (and was committed). Other years keep their tables; readers
+    holding the old table finish with it, new lookups get the new version.
+    Other workers notice the new version on their next request."""
+    if year is None:
+        return
+    if has_request_context():
+        g.pop("_takst_versions", None)
+    get_price_table(year)
 
 
 # --------------------
@@ -176,8 +1082,9 @@ def parametre_page():
 # --------------------
 @udeservering_bp.route("/api/applications")
 @udeservering_bp.route("/api/tilladelser")
+@conditional_get("Tilladelser")
 def api_udeservering_applications():
-    engine = get_engine()
+    engine = get_read_engine()
 
     limit = int(request.args.get("limit", 25))
     offset = int(request.args.get("offset", 0))
@@ -189,18 +1096,13 @@ def api_udeservering_applications():
     lokation = request.args.get("lokation", "")
     year = request.args.get("year", "")          # filter on a specific gældende-fra year
     month = request.args.get("month", "")        # filter on a specific gældende-fra month
+    cursor = request.args.get("cursor")          # keyset mode when present
 
-    valid_sort_columns = {
-        "Id", "Firmanavn", "Adresse", "CVR", "Att", "Geo",
-        "Serveringszone", "Lokation", "Ansogningsdato",
-        "Serveringsareal", "Facadelaengde", "LokationOptionId",
-        "GaeldendeFra", "GaeldendeTilOgMed",
-        "Sommersaeson", "Vintermaaneder",
-    }
-    if sort not in valid_sort_columns:
+    if sort not in TILLADELSE_LIST_COLUMNS:
         sort = "Ansogningsdato"
 
-    if order.lower() not in ("asc", "desc"):
+    order = order.lower()
+    if order not in ("asc", "desc"):
         order = "desc"
 
     params = {"limit": limit, "offset": offset}
@@ -208,17 +1110,11 @@ def api_udeservering_applications():
     where_parts = []
 
     if search:
-        where_parts.append("""
-            (
-                Firmanavn LIKE :search OR
-                Adresse LIKE :search OR
-                CVR LIKE :search OR
-                Att LIKE :search OR
-                Serveringszone LIKE :search OR
-                Lokation LIKE :search
-            )
-        """)
-        params["search"] = f"%{search}%"
+        where_parts.append(_search_clause(
+            "T", search,
+            ("Firmanavn", "Adresse", "CVR", "Att", "Serveringszone", "Lokation"),
+            params,
+        ))
 
     if zone:
         where_parts.append("Serveringszone = :zone")
@@ -236,23 +1132,18 @@ def api_udeservering_applications():
             month_num = MONTH_NAME_TO_NUM.get(month)
             if month_num:
                 where_parts.append("""
-                    DATEFROMPARTS(YEAR(GaeldendeFra), MONTH(GaeldendeFra), 1)
-                        <= DATEFROMPARTS(:year, :month_num, 1)
-                    AND (
-                        GaeldendeTilOgMed IS NULL
-                        OR DATEFROMPARTS(YEAR(GaeldendeTilOgMed), MONTH(GaeldendeTilOgMed), 1)
-                            >= DATEFROMPARTS(:year, :month_num, 1)
-                    )
+                    GaeldendeFraPeriode <= :periode
+                    AND (GaeldendeTilPeriode IS NULL OR GaeldendeTilPeriode >= :periode)
                 """)
-                params["year"] = int(year)
-                params["month_num"] = month_num
+                params["periode"] = _periode(year, month_num)
         else:
             # Year only: tilladelse active in any month of that year.
             where_parts.append("""
-                YEAR(GaeldendeFra) <= :year
-                AND (GaeldendeTilOgMed IS NULL OR YEAR(GaeldendeTilOgMed) >= :year)
+                GaeldendeFraPeriode <= :periode_slut
+                AND (GaeldendeTilPeriode IS NULL OR GaeldendeTilPeriode >= :periode_start)
             """)
-            params["year"] = int(year)
+            params["periode_start"] = _periode(year, 1)
+            params["periode_slut"] = _periode(year, 12)
 
     # Active = the tilladelse has not been opsagt yet.
     # `GaeldendeTilOgMed` in our DB already collapses Opsigelse (it wins over
@@ -261,11 +1152,10 @@ def api_udeservering_applications():
     #   - past month            → inactive (opsagt)
     # We intentionally don't consider GaeldendeFra — a tilladelse with a
     # future start date is still active business-wise.
-    active_expr = """
+    active_expr = f"""
         (
-            GaeldendeTilOgMed IS NULL
-            OR DATEFROMPARTS(YEAR(GaeldendeTilOgMed), MONTH(GaeldendeTilOgMed), 1)
-               >= DATEFROMPARTS(YEAR(GETDATE()), MONTH(GETDATE()), 1)
+            GaeldendeTilPeriode IS NULL
+            OR GaeldendeTilPeriode >= {CURRENT_PERIODE_SQL}
         )
     """
 
@@ -276,32 +1166,45 @@ def api_udeservering_applications():
 
     where_sql = "WHERE " + " AND ".join(where_parts) if where_parts else ""
 
-    query = f"""
-        SELECT *
-        FROM dbo.BrugAarhus_Udeservering
-        {where_sql}
-        ORDER BY {sort} {order}
-        OFFSET :offset ROWS FETCH NEXT :limit ROWS ONLY
-    """
-
-    count_query = f"""
-        SELECT COUNT(*) AS cnt
-        FROM dbo.BrugAarhus_Udeservering
-        {where_sql}
-    """
-
-    with engine.begin() as conn:
-        rows = conn.execute(text(query), params).mappings().all()
-        total = conn.execute(text(count_query), params).scalar()
+    # Keyset mode: seek past the cursor instead of skipping `offset` rows.
+    seek_sql = None
+    if cursor is not None:
+        params["offset"] = 0
+        if cursor:
+            try:
+                seek_value, seek_key = _decode_cursor(cursor, sort, order)
+            except InvalidCursor as e:
+                return jsonify({"success": False, "error": str(e)}), 400
+            seek_sql = _seek_predicate(sort, "Id", order, seek_value, seek_key, params)
+
+    order_by = f"{sort} {order}" + ("" if sort == "Id" else f", Id {order}")
+
+    with engine.connect() as conn:
+        rows, totals = _fetch_page(
+            conn, "dbo.BrugAarhus_Udeservering", TILLADELSE_LIST_COLUMNS,
+            where_sql, order_by, params,
+            {"total": ("count", None)}, seek_sql=seek_sql,
+            totals=request.args.get("totals") == "1",
+        )
 
-    return jsonify({"total": total, "rows": [dict(r) for r in rows]})
+    result = _rows_result({"total": totals["total"]} if totals else {}, rows)
+    if cursor is not None:
+        result["next_cursor"] = (
+            _encode_cursor(sort, order, rows[-1][sort], rows[-1]["Id"])
+            if len(rows) == limit else None
+        )
+    return jsonify(result)
 
 
 @udeservering_bp.route("/api/applications/filters")
 def api_applications_filters():
     """Distinct values used to populate filter dropdowns."""
-    engine = get_engine()
-    with engine.begin() as conn:
+    return jsonify(_cached_filter_options("tilladelser", "Tilladelser", _load_tilladelser_filter_options))
+
+
+def _load_tilladelser_filter_options():
+    engine = get_read_engine()
+    with engine.connect() as conn:
         zones = [r[0] for r in conn.execute(text("""
             SELECT DISTINCT Serveringszone
             FROM dbo.BrugAarhus_Udeservering
@@ -316,43 +1219,26 @@ def api_applications_filters():
             ORDER BY Lokation
         """)).fetchall()]
 
-    return jsonify({"zones": zones, "lokationer": lokationer})
+    return {"zones": zones, "lokationer": lokationer}
 
 
-@udeservering_bp.route("/api/fakturering")
-def api_fakturering():
-    status = request.args.get("status", "Ny")
-    limit = int(request.args.get("limit", 25))
-    offset = int(request.args.get("offset", 0))
-    search = request.args.get("search", "")
-    year = request.args.get("year", "")
-    month = request.args.get("month", "")
-    zone = request.args.get("zone", "")
-    lokation = request.args.get("lokation", "")
+def _fakturering_filter_clause(args, params):
+    """Build the WHERE clause shared by the fakturalinje list endpoints.
+
+    Returns (where_sql, pris_col) where pris_col is the SQL expression for the
+    line's effective price under the requested status."""
+    status = args.get("status", "Ny")
+    search = args.get("search", "")
+    year = args.get("year", "")
+    month = args.get("month", "")
+    zone = args.get("zone", "")
+    lokation = args.get("lokation", "")
     # Period filter: "current_and_earlier" -> only show fakturalinjer whose
     # month-date <= last day of the current month. Anything else = no filter.
-    period_filter = request.args.get("period_filter", "")
+    period_filter = args.get("period_filter", "")
     # When truthy, hide rows where the (computed) Pris is null/0.
-    hide_zero = request.args.get("hide_zero", "").lower() in ("1", "true", "yes")
-
-    sort = request.args.get("sort", "FakturaDatoSort")
-    order = request.args.get("order", "desc")
-
-    valid_sort_columns = {
-        "FakturaDatoSort", "FakturaLinjeID", "DeskproID", "Firmanavn",
-        "Adresse", "Att", "FakturaMaaned", "FakturaAar", "Lokation",
-        "Serveringszone", "Serveringsareal", "Facadelaengde", "Pris",
-        "FakturaStatus",
-    }
-    if sort not in valid_sort_columns:
-        sort = "FakturaDatoSort"
-
-    if order.lower() not in ("asc", "desc"):
-        order = "desc"
-
-    engine = get_engine()
+    hide_zero = args.get("hide_zero", "").lower() in ("1", "true", "yes")
 
-    params = {"limit": limit, "offset": offset}
     where_parts = ["1=1"]
 
     if status:
@@ -360,24 +1246,21 @@ def api_fakturering():
         params["status"] = status
 
     if search:
-        where_parts.append("""
-            (
-                  Firmanavn LIKE :search
-               OR Adresse LIKE :search
-               OR DeskproID LIKE :search
-               OR CVR LIKE :search
-               OR Att LIKE :search
-            )
-        """)
-        params["search"] = f"%{search}%"
+        where_parts.append(_search_clause(
+            "F", search, ("Firmanavn", "Adresse", "DeskproID", "CVR", "Att"), params,
+        ))
 
-    if year:
-        where_parts.append("FakturaAar = :year")
-        params["year"] = int(year)
+    if year and _month_num(month):
+        where_parts.append("FakturaPeriode = :periode")
+        params["periode"] = _periode(year, _month_num(month))
+    else:
+        if year:
+            where_parts.append("FakturaAar = :year")
+            params["year"] = int(year)
 
-    if month:
-        where_parts.append("FakturaMaaned = :month")
-        params["month"] = month
+        if month:
+            where_parts.append("FakturaMaaned = :month")
+            params["month"] = month
 
     if zone:
         where_parts.append("Serveringszone = :zone")
@@ -389,100 +1272,244 @@ def api_fakturering():
 
     if period_filter == "current_and_earlier":
         # Include the current month and everything before it.
-        where_parts.append(
-            "FakturaDatoSort <= DATEFROMPARTS(YEAR(GETDATE()), MONTH(GETDATE()), 1)"
+        where_parts.append(f"FakturaPeriode <= {CURRENT_PERIODE_SQL}")
+
+    # Ny lines carry their live price in PrisBeregnet (written by
+    # reprice_stale_lines); locked lines have the authoritative Pris.
+    if status == "Ny":
+        pris_col = "PrisBeregnet"
+    elif status:
+        pris_col = "Pris"
+    else:
+        pris_col = PRIS_EXPR
+
+    if hide_zero:
+        where_parts.append(f"{pris_col} > 0")
+
+    return "WHERE " + " AND ".join(where_parts), pris_col
+
+
+@udeservering_bp.route("/api/fakturering")
+@conditional_get("Fakturalinjer", "Takster")
+def api_fakturering():
+    status = request.args.get("status", "Ny")
+    limit = int(request.args.get("limit", 25))
+    offset = int(request.args.get("offset", 0))
+    cursor = request.args.get("cursor")  # keyset mode when present
+
+    sort = request.args.get("sort", "FakturaDatoSort")
+    order = request.args.get("order", "desc")
+
+    valid_sort_columns = {
+        "FakturaDatoSort", "FakturaLinjeID", "DeskproID", "Firmanavn",
+        "Adresse", "Att", "FakturaMaaned", "FakturaAar", "Lokation",
+        "Serveringszone", "Serveringsareal", "Facadelaengde", "Pris",
+        "FakturaStatus",
+    }
+    if sort not in valid_sort_columns:
+        sort = "FakturaDatoSort"
+
+    order = order.lower()
+    if order not in ("asc", "desc"):
+        order = "desc"
+
+    engine = get_read_engine()
+
+    params = {"limit": limit, "offset": offset}
+    base_where, pris_col = _fakturering_filter_clause(request.args, params)
+
+    sort_expr = pris_col if sort == "Pris" else sort
+    order_by = f"{sort_expr} {order}"
+    if sort != "FakturaLinjeID":
+        order_by += f", FakturaLinjeID {order}"
+    if status == "Ny":
+        # Sort NULLs (no zone-takst) last regardless of direction.
+        order_by = f"CASE WHEN {sort_expr} IS NULL THEN 1 ELSE 0 END, " + order_by
+
+    # Keyset mode: seek past the cursor instead of skipping `offset` rows.
+    seek_sql = None
+    if cursor is not None:
+        params["offset"] = 0
+        if cursor:
+            try:
+                seek_value, seek_key = _decode_cursor(cursor, sort, order)
+            except InvalidCursor as e:
+                return jsonify({"success": False, "error": str(e)}), 400
+            seek_sql = _seek_predicate(
+                sort_expr, "FakturaLinjeID", order, seek_value, seek_key, params,
+                nulls_first=False if status == "Ny" else None,
+            )
+
+    with engine.connect() as conn:
+        rows, totals = _fetch_page(
+            conn, "BrugAarhus_Udeservering_Fakturalinjer", FAKTURALINJE_LIST_COLUMNS,
+            base_where, order_by, params,
+            {
+                "lines": ("count", None),
+                "firms": ("distinct", "DeskproID"),
+                "sum_pris": ("sum", pris_col),
+            },
+            seek_sql=seek_sql, totals=request.args.get("totals") == "1",
         )
 
-    base_where = "WHERE " + " AND ".join(where_parts)
+    final_rows = _with_effective_prices(rows)
 
-    # For status=Ny, Pris is computed on-read (DB column is NULL until godkendt).
-    # We therefore fetch ALL matching rows, compute prices, optionally drop
-    # 0-kr rows, then sort/paginate in Python. This keeps the summary KPIs
-    # accurate AND lets hide_zero work without breaking pagination math.
-    # For locked statuses (TilFakturering/Faktureret/FakturerIkke), Pris lives
-    # in the DB so we use plain SQL pagination + SUM.
-    all_query = f"""
-        SELECT *
-        FROM BrugAarhus_Udeservering_Fakturalinjer
-        {base_where}
-    """
+    result = {}
+    if totals is not None:
+        result["total"] = totals["lines"]
+        result["summary"] = {
+            "lines": totals["lines"],
+            "firms": totals["firms"],
+            "sum_pris": float(totals["sum_pris"] or 0),
+        }
+    result = _rows_result(result, final_rows)
+    if cursor is not None:
+        next_cursor = None
+        if len(rows) == limit:
+            last = rows[-1]
+            if sort != "Pris":
+                last_value = last[sort]
+            elif pris_col == "PrisBeregnet" or (pris_col == PRIS_EXPR and last["FakturaStatus"] == "Ny"):
+                last_value = last["PrisBeregnet"]
+            else:
+                last_value = last["Pris"]
+            next_cursor = _encode_cursor(sort, order, last_value, last["FakturaLinjeID"])
+        result["next_cursor"] = next_cursor
+    return jsonify(result)
+
+
+@udeservering_bp.route("/api/fakturering/grouped")
+@conditional_get("Fakturalinjer", "Takster")
+def api_fakturering_grouped():
+    """Fakturalinjer grouped by month (FakturaPeriode), paged by month.
+
+    Takes the same filters as /api/fakturering plus `page` (1-based),
+    `months_per_page` and `group_order` (asc = oldest month first). Returns
+    the month headers for the requested page with their totals and rows,
+    the total number of months, and the overall summary."""
+    page = max(int(request.args.get("page", 1)), 1)
+    months_per_page = min(max(int(request.args.get("months_per_page", 6)), 1), 24)
+    group_order = request.args.get("group_order", "desc")
+    if group_order.lower() not in ("asc", "desc"):
+        group_order = "desc"
+
+    engine = get_read_engine()
+
+    params = {}
+    base_where, pris_col = _fakturering_filter_clause(request.args, params)
 
-    sum_query_locked = f"""
+    # Month headers and the grand total (the () grouping set) in one scan.
+    groups_sql = f"""
         SELECT
+            FakturaPeriode,
+            MIN(FakturaAar) AS FakturaAar,
+            MIN(FakturaMaaned) AS FakturaMaaned,
+            GROUPING(FakturaPeriode) AS is_total,
             COUNT(*) AS cnt,
             COUNT(DISTINCT DeskproID) AS firms,
-            COALESCE(SUM(Pris), 0) AS sum_pris
+            COALESCE(SUM({pris_col}), 0) AS sum_pris
         FROM BrugAarhus_Udeservering_Fakturalinjer
         {base_where}
+        GROUP BY GROUPING SETS ((FakturaPeriode), ())
     """
 
-    sort_desc = (order.lower() == "desc")
+    with engine.connect() as conn:
+        group_rows = conn.execute(text(groups_sql), params).mappings().all()
+        s = next(
+            (g for g in group_rows if g["is_total"]),
+            {"cnt": 0, "firms": 0, "sum_pris": 0},
+        )
 
-    with engine.begin() as conn:
-        if status == "Ny":
-            # Fetch everything matching, price it, optionally hide zeros, then paginate.
-            all_rows = [dict(r) for r in conn.execute(text(all_query), params).mappings().all()]
-            for r in all_rows:
-                month_num = MONTH_NAME_TO_NUM.get(
-                    (r["FakturaMaaned"] or "").split(" ")[0], 0
-                )
-                calc = beregn_pris(
-                    r["Serveringszone"],
-                    r["Lokation"],
-                    float(r["Serveringsareal"] or 0),
-                    float(r["Facadelaengde"] or 0),
-                    month_num,
-                    r["FakturaAar"],
-                )
-                r["Pris"] = calc["belob"] if calc.get("ok") else None
-
-            if hide_zero:
-                all_rows = [r for r in all_rows if r["Pris"] is not None and r["Pris"] > 0]
-
-            # Summary across the (possibly filtered) result set.
-            sum_pris = sum(r["Pris"] for r in all_rows if r["Pris"] is not None)
-            firms = {r["DeskproID"] for r in all_rows}
-            summary = {"lines": len(all_rows), "firms": len(firms), "sum_pris": sum_pris}
-
-            # Sort + paginate in Python.
-            def _key(r):
-                v = r.get(sort)
-                # Sort Nones last regardless of direction.
-                return (v is None, v if v is not None else 0)
-            all_rows.sort(key=_key, reverse=sort_desc)
-            total = len(all_rows)
-            final_rows = all_rows[offset:offset + limit]
-        else:
-            count_sql = f"SELECT COUNT(*) FROM BrugAarhus_Udeservering_Fakturalinjer {base_where}"
-            page_sql = f"""
-                SELECT *
+        groups = sorted(
+            (g for g in group_rows if not g["is_total"]),
+            key=lambda g: g["FakturaPeriode"] or 0,
+            reverse=(group_order.lower() == "desc"),
+        )
+        total_groups = len(groups)
+        pages = max(1, -(-total_groups // months_per_page))
+        page = min(page, pages)
+        page_groups = groups[(page - 1) * months_per_page: page * months_per_page]
+
+        rows = []
+        if page_groups:
+            month_parts = []
+            for i, g in enumerate(page_groups):
+                if g["FakturaPeriode"] is None:
+                    month_parts.append("FakturaPeriode IS NULL")
+                else:
+                    month_parts.append(f"FakturaPeriode = :g_periode{i}")
+                    params[f"g_periode{i}"] = g["FakturaPeriode"]
+            rows = conn.execute(text(f"""
+                SELECT {_select_list(FAKTURALINJE_LIST_COLUMNS)}
                 FROM BrugAarhus_Udeservering_Fakturalinjer
                 {base_where}
-                ORDER BY {sort} {order}
-                OFFSET :offset ROWS FETCH NEXT :limit ROWS ONLY
-            """
-            rows = conn.execute(text(page_sql), params).mappings().all()
-            total = conn.execute(text(count_sql), params).scalar()
-            s = conn.execute(text(sum_query_locked), params).mappings().first()
-            summary = {
-                "lines": s["cnt"],
-                "firms": s["firms"],
-                "sum_pris": float(s["sum_pris"] or 0),
+                  AND ({" OR ".join(month_parts)})
+                ORDER BY FakturaDatoSort {group_order}, FakturaLinjeID
+            """), params).mappings().all()
+
+    _metric_add("rows_fetched", len(group_rows) + len(rows))
+    by_month = {}
+    for r in _with_effective_prices([dict(r) for r in rows]):
+        by_month.setdefault(r["FakturaPeriode"], []).append(r)
+
+    result = {
+        "page": page,
+        "pages": pages,
+        "total_groups": total_groups,
+        "summary": {
+            "lines": s["cnt"],
+            "firms": s["firms"],
+            "sum_pris": float(s["sum_pris"] or 0),
+        },
+        "groups": [
+            {
+                "key": f"{g['FakturaAar']}-{(g['FakturaPeriode'] or 0) % 100:02d}",
+                "label": f"{g['FakturaMaaned']} {g['FakturaAar']}",
+                "year": g["FakturaAar"],
+                "month": g["FakturaMaaned"],
+                "lines": g["cnt"],
+                "firms": g["firms"],
+                "sum_pris": float(g["sum_pris"] or 0),
+                "rows": by_month.get(g["FakturaPeriode"], []),
             }
-            final_rows = [dict(r) for r in rows]
+            for g in page_groups
+        ],
+    }
+    if _columnar_requested():
+        # One column list for the response; each month carries its "data".
+        result["columns"] = _columnar(rows)[0]
+        for g in result["groups"]:
+            g["data"] = _columnar(g.pop("rows"))[1]
+    return jsonify(result)
+
+
+@udeservering_bp.route("/api/fakturering/export")
+def api_fakturering_export():
+    """Download the lines of a status list (same filters as /api/fakturering)
+    as `format=xlsx` or `format=parquet`."""
+    fmt = request.args.get("format", "xlsx").lower()
+    status = request.args.get("status", "Ny")
 
-    return jsonify({
-        "total": total,
-        "rows": final_rows,
-        "summary": summary,
-    })
+    params = {}
+    where_sql, _ = _fakturering_filter_clause(request.args, params)
+
+    return _export_file_response(
+        fmt, _iter_export_chunks(get_read_engine(), where_sql, params),
+        f"BrugAarhus_fakturalinjer_{status or 'alle'}",
+    )
 
 
 @udeservering_bp.route("/api/fakturering/year_options")
 def api_fakturering_year_options():
     """Distinct year + month combinations for filter dropdowns."""
-    engine = get_engine()
-    with engine.begin() as conn:
+    return jsonify(_cached_filter_options("fakturalinjer", "Fakturalinjer", _load_fakturalinje_filter_options))
+
+
+def _load_fakturalinje_filter_options():
+    """Years, zones and lokationer present on fakturalinjer — shared by the
+    fakturering and statistik dropdowns."""
+    engine = get_read_engine()
+    with engine.connect() as conn:
         years = [r[0] for r in conn.execute(text("""
             SELECT DISTINCT FakturaAar
             FROM BrugAarhus_Udeservering_Fakturalinjer
@@ -503,7 +1530,7 @@ def api_fakturering_year_options():
             ORDER BY Lokation
         """)).fetchall()]
 
-    return jsonify({"years": years, "zones": zones, "lokationer": lokationer})
+    return {"years": years, "zones": zones, "lokationer": lokationer}
 
 
 @udeservering_bp.route("/api/fakturering/reset", methods=["POST"])
@@ -533,6 +1560,10 @@ def api_fakturering_bulk_status():
 
     if not ids:
         return jsonify({"success": False, "error": "Ingen IDs modtaget."})
+    try:
+        ids = _parse_ids(ids)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
 
     status_map = {
         "godkend": "TilFakturering",
@@ -545,19 +1576,22 @@ def api_fakturering_bulk_status():
 
     engine = get_engine()
 
-    placeholders = ", ".join(f":id{i}" for i in range(len(ids)))
-    params = {f"id{i}": idv for i, idv in enumerate(ids)}
+    params = {}
+    id_list = _id_list(ids, params)
 
     sql = text(f"""
         UPDATE BrugAarhus_Udeservering_Fakturalinjer
         SET FakturaStatus = :status
-        WHERE FakturaLinjeID IN ({placeholders})
+        WHERE FakturaLinjeID IN ({id_list})
     """)
 
     params["status"] = new_status
 
     with engine.begin() as conn:
         conn.execute(sql, params)
+        if new_status == "Ny":
+            # Back in Til godkendelse: price with today's takster.
+            _refresh_prisberegnet(conn, f"FakturaLinjeID IN ({id_list})", params)
 
     return jsonify({"success": True})
 
@@ -569,18 +1603,22 @@ def api_fakturering_bulk_godkend():
 
     if not ids:
         return jsonify({"success": False, "error": "Ingen IDs modtaget."})
+    try:
+        ids = _parse_ids(ids)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
 
     engine = get_engine()
 
     with engine.begin() as conn:
-        placeholders = ", ".join(f":id{i}" for i in range(len(ids)))
-        params = {f"id{i}": idv for i, idv in enumerate(ids)}
+        params = {}
+        id_list = _id_list(ids, params)
 
         rows = [
             dict(r) for r in conn.execute(text(f"""
-                SELECT *
+                SELECT {_select_list(FAKTURALINJE_PRICING_COLUMNS + ("CVR",))}
                 FROM BrugAarhus_Udeservering_Fakturalinjer
-                WHERE FakturaLinjeID IN ({placeholders})
+                WHERE FakturaLinjeID IN ({id_list})
             """), params).mappings().all()
         ]
 
@@ -598,21 +1636,9 @@ def api_fakturering_bulk_godkend():
             }), 400
 
         # Compute prices up-front and refuse if any line ends up at 0/negative —
-        # afgiftsfri lines shouldn't go to SAP.
-        priced = []
-        for row in rows:
-            if row["FakturaStatus"] in ("Faktureret", "TilFakturering"):
-                continue
-            zone = row["Serveringszone"]
-            lokation = row["Lokation"]
-            areal = float(row["Serveringsareal"] or 0)
-            facade = float(row["Facadelaengde"] or 0)
-            month_name = (row["FakturaMaaned"] or "").split(" ")[0]
-            month_num = MONTH_NAME_TO_NUM.get(month_name, 0)
-            year = int(row["FakturaAar"])
-            calc = beregn_pris(zone, lokation, areal, facade, month_num, year)
-            pris = calc["belob"] if calc.get("ok") else None
-            priced.append((row, pris))
+        # afgiftsfri lines shouldn't go to SAP. Only Ny lines are approved.
+        to_price = [r for r in rows if r["FakturaStatus"] == "Ny"]
+        priced = list(zip(to_price, _price_fakturalinjer(to_price)))
 
         zero_rows = [r for (r, p) in priced if p is None or p <= 0]
         if zero_rows:
@@ -625,17 +1651,45 @@ def api_fakturering_bulk_godkend():
                 "invalid_ids": [r["FakturaLinjeID"] for r in zero_rows],
             }), 400
 
-        approved = 0
-        for (row, pris) in priced:
-            conn.execute(text("""
-                UPDATE BrugAarhus_Udeservering_Fakturalinjer
-                SET Pris = :pris,
-                    FakturaStatus = 'TilFakturering'
-                WHERE FakturaLinjeID = :id
-            """), {"pris": pris, "id": row["FakturaLinjeID"]})
-            approved += 1
+        if not priced:
+            return jsonify({"success": True, "approved": 0, "approved_ids": []})
 
-        return jsonify({"success": True, "approved": approved})
+        # Stage id + price, then lock them all in one UPDATE. OUTPUT has to go
+        # INTO a table: the fakturalinje triggers rule out a bare OUTPUT.
+        conn.execute(text("""
+            DROP TABLE IF EXISTS #godkend;
+            DROP TABLE IF EXISTS #godkendt;
+            CREATE TABLE #godkend (FakturaLinjeID int PRIMARY KEY, Pris decimal(12,2) NOT NULL);
+            CREATE TABLE #godkendt (FakturaLinjeID int PRIMARY KEY);
+        """))
+        conn.execute(text("""
+            INSERT INTO #godkend (FakturaLinjeID, Pris)
+            SELECT id, pris
+            FROM OPENJSON(:rows) WITH (id int '$.id', pris decimal(12,2) '$.pris')
+        """), {"rows": json.dumps([
+            {"id": row["FakturaLinjeID"], "pris": pris} for (row, pris) in priced
+        ])})
+
+        conn.execute(text("""
+            UPDATE f
+            SET Pris = g.Pris,
+                FakturaStatus = 'TilFakturering'
+            OUTPUT inserted.FakturaLinjeID INTO #godkendt (FakturaLinjeID)
+            FROM BrugAarhus_Udeservering_Fakturalinjer f
+            JOIN #godkend g ON g.FakturaLinjeID = f.FakturaLinjeID
+            WHERE f.FakturaStatus = 'Ny'
+        """))
+        approved_ids = [r[0] for r in conn.execute(text("""
+            SELECT FakturaLinjeID FROM #godkendt ORDER BY FakturaLinjeID
+        """)).fetchall()]
+
+        conn.execute(text("DROP TABLE #godkend; DROP TABLE #godkendt;"))
+
+        return jsonify({
+            "success": True,
+            "approved": len(approved_ids),
+            "approved_ids": approved_ids,
+        })
 
 
 @udeservering_bp.route("/api/fakturering/reset_bulk", methods=["POST"])
@@ -645,15 +1699,17 @@ def api_fakturering_reset_bulk():
 
     if not ids:
         return jsonify({"success": False, "error": "Ingen IDs modtaget."})
+    try:
+        ids = _parse_ids(ids)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
 
     engine = get_engine()
 
-    placeholders = ", ".join(f":id{i}" for i in range(len(ids)))
-    params = {f"id{i}": idv for i, idv in enumerate(ids)}
-
+    params = {}
     sql = text(f"""
         DELETE FROM BrugAarhus_Udeservering_Fakturalinjer
-        WHERE FakturaLinjeID IN ({placeholders})
+        WHERE FakturaLinjeID IN ({_id_list(ids, params)})
     """)
 
     with engine.begin() as conn:
@@ -664,17 +1720,30 @@ def api_fakturering_reset_bulk():
 
 @udeservering_bp.route("/api/fakturering/<int:id>")
 def api_fakturering_get(id):
-    engine = get_engine()
-    with engine.begin() as conn:
+    engine = get_read_engine()
+    with engine.connect() as conn:
         row = conn.execute(
-            text("SELECT * FROM BrugAarhus_Udeservering_Fakturalinjer WHERE FakturaLinjeID = :id"),
+            text(f"""
+                SELECT {_select_list(FAKTURALINJE_DETAIL_COLUMNS)}
+                FROM BrugAarhus_Udeservering_Fakturalinjer
+                WHERE FakturaLinjeID = :id
+            """),
             {"id": id}
         ).mappings().first()
 
     if not row:
         return jsonify({"success": False, "error": "Fakturalinje ikke fundet"}), 404
 
-    return jsonify({"success": True, "data": dict(row)})
+    data = dict(row)
+    if data["FakturaStatus"] == "Ny" and data["PrisBeregnetTidspunkt"] is None:
+        # Not priced since its inputs changed: show the live price.
+        res = _batch_price_rows([data])
+        ok = res["ok"].tolist()[0]
+        data["PrisBeregnet"] = res["belob"].tolist()[0] if ok else None
+        data["PrisBeregnetSommer"] = res["sommer"].tolist()[0] if ok else None
+        data["PrisBeregnetMinimum"] = res["minimum_applied"].tolist()[0] if ok else None
+
+    return jsonify({"success": True, "data": data})
 
 
 @udeservering_bp.route("/api/fakturering/update", methods=["POST"])
@@ -699,8 +1768,7 @@ def api_fakturering_update():
     # Block godkend if CVR isn't valid — SAP would reject the invoice anyway —
     # and refuse to approve afgiftsfri linjer (pris 0 or negative).
     if action == "godkend":
-        engine = get_engine()
-        with engine.begin() as conn:
+        with get_read_engine().connect() as conn:
             cvr_row = conn.execute(text("""
                 SELECT CVR FROM BrugAarhus_Udeservering_Fakturalinjer WHERE FakturaLinjeID = :id
             """), {"id": fid}).first()
@@ -757,16 +1825,18 @@ def api_fakturering_update():
             SET {set_clause}
             WHERE FakturaLinjeID = :id
         """), params)
+        if new_status == "Ny":
+            _refresh_prisberegnet(conn, "FakturaLinjeID = :id", {"id": fid})
 
     return jsonify({"success": True})
 
 
 @udeservering_bp.route("/api/parametre")
 def api_parametre_list():
-    engine = get_engine()
+    engine = get_read_engine()
     year = request.args.get("year", type=int)
 
-    with engine.begin() as conn:
+    with engine.connect() as conn:
 
         if request.args.get("years_only"):
             years = conn.execute(text("""
@@ -796,29 +1866,31 @@ def api_parametre_update():
 
     engine = get_engine()
 
-    with engine.begin() as conn:
-        for r in rows:
+    if rows:
+        with engine.begin() as conn:
+            # One executemany (fast_executemany on pyodbc) for all rows.
             conn.execute(text("""
                 UPDATE BrugAarhus_Udeservering_Parametre
                 SET VaerdiDecimal = :VaerdiDecimal,
                     VaerdiTekst   = :VaerdiTekst
                 WHERE Noegle = :Noegle
                   AND [Year] = :Year
-            """), r)
+            """), rows)
 
-    load_prisdata_for_year.cache_clear()
+    for year in {r.get("Year") for r in rows}:
+        _tariffs_changed(year)
     return jsonify({"success": True})
 
 
 @udeservering_bp.route("/api/takster")
 def api_takster():
-    engine = get_engine()
+    engine = get_read_engine()
     year = request.args.get("year", type=int)
 
     if not year:
         year = datetime.date.today().year
 
-    with engine.begin() as conn:
+    with engine.connect() as conn:
         rows = conn.execute(text("""
             SELECT Id,
                    ZoneKode,
@@ -858,19 +1930,19 @@ def api_takster_update(id):
     with engine.begin() as conn:
         conn.execute(sql, data)
 
-    load_prisdata_for_year.cache_clear()
+    _tariffs_changed(data.get("Year"))
     return jsonify({"success": True})
 
 
 @udeservering_bp.route("/api/saeson")
 def api_saeson():
-    engine = get_engine()
+    engine = get_read_engine()
     year = request.args.get("year", type=int)
 
     if not year:
         year = datetime.date.today().year
 
-    with engine.begin() as conn:
+    with engine.connect() as conn:
         rows = conn.execute(text("""
             SELECT Id, MaanedNr, Maanedsnavn, Saeson, [Year]
             FROM BrugAarhus_Udeservering_Saeson
@@ -899,14 +1971,15 @@ def api_saeson_update(id):
     with engine.begin() as conn:
         conn.execute(sql, data)
 
-    load_prisdata_for_year.cache_clear()
+    _tariffs_changed(data.get("Year"))
     return jsonify({"success": True})
 
 
 @udeservering_bp.route("/api/statistik/table")
+@conditional_get("Tilladelser")
 def api_udeservering_statistik_table():
-    engine = get_engine()
-    with engine.begin() as conn:
+    engine = get_read_engine()
+    with engine.connect() as conn:
         rows = conn.execute(text("""
             SELECT
                 Id,
@@ -924,7 +1997,8 @@ def api_udeservering_statistik_table():
             ORDER BY Id DESC
         """)).mappings().all()
 
-    return jsonify({"total": len(rows), "rows": [dict(r) for r in rows]})
+    _metric_add("rows_fetched", len(rows))
+    return jsonify(_rows_result({"total": len(rows)}, [dict(r) for r in rows]))
 
 
 # Deskpro option IDs for FIELD_LOKATION (1192). Mirrors process.py in the
@@ -949,25 +2023,22 @@ def _is_facade(lokation_option_id, lokation_text):
     return txt.startswith("facade") or txt.startswith("ved facade")
 
 
+@_timed_phase("pricing_seconds")
 def beregn_pris(zone, lokation, serveringsareal, facadelaengde, month, year, lokation_option_id=None):
-    data = load_prisdata_for_year(year)
-
-    params = data["params"]
-    takster = data["takster"]
-    saeson_map = data["saeson"]
+    _metric_add("rows_priced")
+    table = get_price_table(year)
 
-    saeson = saeson_map.get(month)
-    sommer = (saeson == "Sommer")
+    sommer = table.sommer_months[month] if 0 <= month <= 12 else False
 
-    t = takster.get((zone or "").upper())
-    if not t:
+    zi = table.zone_codes.get((zone or "").upper())
+    if not zi:
         return {"ok": False, "error": f"Zone-takst ikke fundet for zone '{zone}'."}
 
-    pris_pr_m2 = float(t["SommerPrisPrM2"] if sommer else t["VinterPrisPrM2"])
+    pris_pr_m2 = table.sommer_rates[zi] if sommer else table.vinter_rates[zi]
 
-    facadebredde = float(params.get("Facadebredde i meter", 0.8))
-    min_areal = float(params.get("Minimums opkrævningsareal", 1.0))
-    min_belob = float(params.get("Minimums opkrævningsbeløb", 250.0))
+    facadebredde = table.facadebredde
+    min_areal = table.min_areal
+    min_belob = table.min_belob
 
     brutto = max(float(serveringsareal or 0), min_areal)
 
@@ -990,6 +2061,217 @@ def beregn_pris(zone, lokation, serveringsareal, facadelaengde, month, year, lok
     }
 
 
+@_timed_phase("pricing_seconds")
+def beregn_pris_batch(zones, lokationer, arealer, facader, months, years, lokation_option_ids=None):
+    """Vectorized beregn_pris over whole columns (one entry per fakturalinje).
+
+    Gives exactly the same numbers as calling beregn_pris row by row, but
+    fetches the PriceTable once per year and does the arithmetic in NumPy.
+    Returns a dict of arrays aligned with the input:
+      ok (bool), belob (float, NaN where not ok), sommer (bool), minimum_applied (bool).
+    """
+    n = len(zones)
+    _metric_add("rows_priced", n)
+    areal = np.asarray(arealer, dtype=float).reshape(n)
+    facade = np.asarray(facader, dtype=float).reshape(n)
+    month = np.asarray(months, dtype=np.int64).reshape(n)
+    month = np.where((month >= 0) & (month <= 12), month, 0)
+
+    if lokation_option_ids is None:
+        lokation_option_ids = [None] * n
+    facade_keys = list(zip(lokation_option_ids, lokationer))
+    facade_lookup = {k: _is_facade(*k) for k in set(facade_keys)}
+    is_facade = np.fromiter((facade_lookup[k] for k in facade_keys), dtype=bool, count=n)
+
+    ok = np.zeros(n, dtype=bool)
+    sommer = np.zeros(n, dtype=bool)
+    minimum_applied = np.zeros(n, dtype=bool)
+    belob = np.full(n, np.nan)
+
+    by_year = {}
+    for i, y in enumerate(years):
+        by_year.setdefault(y, []).append(i)
+
+    for year, idx_list in by_year.items():
+        idx = np.asarray(idx_list, dtype=np.int64)
+        table = get_price_table(year)
+
+        zi = np.fromiter(
+            (table.zone_codes.get((zones[i] or "").upper(), 0) for i in idx_list),
+            dtype=np.int64, count=len(idx_list),
+        )
+        known = zi > 0
+
+        s = table.sommer_months_arr[month[idx]]
+        pris_pr_m2 = np.where(s, table.sommer_rates_arr[zi], table.vinter_rates_arr[zi])
+
+        facadebredde = table.facadebredde
+        min_areal = table.min_areal
+        min_belob = table.min_belob
+
+        brutto = np.maximum(areal[idx], min_areal)
+        netto = np.where(
+            is_facade[idx],
+            np.maximum(brutto - facade[idx] * facadebredde, 0.0),
+            brutto,
+        )
+        beloeb_raw = netto * pris_pr_m2
+        beloeb = np.maximum(beloeb_raw, min_belob)
+
+        ok[idx] = known
+        sommer[idx] = s
+        belob[idx] = np.where(known, beloeb, np.nan)
+        minimum_applied[idx] = known & (beloeb == min_belob) & (beloeb_raw < min_belob)
+
+    # Python's round() rather than np.round(): the two disagree on some
+    # half-øre values, and the batch must match beregn_pris exactly.
+    belob = np.array([round(v, 2) for v in belob.tolist()], dtype=float)
+
+    return {
+        "ok": ok,
+        "belob": belob,
+        "sommer": sommer,
+        "minimum_applied": minimum_applied,
+    }
+
+
+def _batch_price_rows(rows):
+    """beregn_pris_batch over a list of fakturalinje rows."""
+    return beregn_pris_batch(
+        [r.get("Serveringszone") for r in rows],
+        [r.get("Lokation") for r in rows],
+        [float(r.get("Serveringsareal") or 0) for r in rows],
+        [float(r.get("Facadelaengde") or 0) for r in rows],
+        [_month_num(r.get("FakturaMaaned")) for r in rows],
+        [r.get("FakturaAar") for r in rows],
+    )
+
+
+def _price_fakturalinjer(rows):
+    """Live Pris for a list of fakturalinje rows via beregn_pris_batch.
+    Returns one value per row; None where no zone-takst was found."""
+    if not rows:
+        return []
+    res = _batch_price_rows(rows)
+    return [
+        b if o else None
+        for b, o in zip(res["belob"].tolist(), res["ok"].tolist())
+    ]
+
+
+# ---------------------------------------------------------------------------
+#  Persisted price for Ny lines (sql/migrate_add_prisberegnet_columns.sql).
+#  PrisBeregnetTidspunkt IS NULL marks a Ny line whose price must be
+#  (re)computed; a trigger sets it whenever a pricing input changes.
+# ---------------------------------------------------------------------------
+# Effective price in SQL: PrisBeregnet while Ny, the locked Pris afterwards.
+PRIS_EXPR = "(CASE WHEN FakturaStatus = 'Ny' THEN PrisBeregnet ELSE Pris END)"
+
+
+def _refresh_prisberegnet(conn, where_sql, params=None):
+    """Recompute PrisBeregnet (+ sommer/minimum flags) for the Ny lines
+    matching `where_sql`. Returns the number of lines written."""
+    claim = datetime.datetime.now()
+
+    # Claim the lines first, as _refresh_search_index does: they stay locked
+    # until commit, so an input edit (or a tariff trigger marking them stale)
+    # waits for this price instead of being overwritten by it.
+    conn.execute(text(f"""
+        UPDATE BrugAarhus_Udeservering_Fakturalinjer
+        SET PrisBeregnetTidspunkt = :claim
+        WHERE FakturaStatus = 'Ny' AND ({where_sql})
+    """), {**(params or {}), "claim": claim})
+
+    rows = [
+        dict(r) for r in conn.execute(text(f"""
+            SELECT {_select_list(FAKTURALINJE_PRICING_COLUMNS)}
+            FROM BrugAarhus_Udeservering_Fakturalinjer
+            WHERE FakturaStatus = 'Ny' AND PrisBeregnetTidspunkt = :claim
+        """), {"claim": claim}).mappings().all()
+    ]
+    if not rows:
+        return 0
+
+    res = _batch_price_rows(rows)
+    updates = [
+        {
+            "id": r["FakturaLinjeID"],
+            "claim": claim,
+            "pris": b if o else None,
+            "sommer": s if o else None,
+            "minimum": m if o else None,
+        }
+        for r, o, b, s, m in zip(
+            rows,
+            res["ok"].tolist(),
+            res["belob"].tolist(),
+            res["sommer"].tolist(),
+            res["minimum_applied"].tolist(),
+        )
+    ]
+    conn.execute(text("""
+        UPDATE BrugAarhus_Udeservering_Fakturalinjer
+        SET PrisBeregnet          = :pris,
+            PrisBeregnetSommer    = :sommer,
+            PrisBeregnetMinimum   = :minimum,
+            PrisBeregnetTidspunkt = SYSDATETIME()
+        WHERE FakturaLinjeID = :id
+          AND FakturaStatus = 'Ny'
+          AND PrisBeregnetTidspunkt = :claim
+    """), updates)
+    return len(updates)
+
+
+def _tariffs_changed(year):
+    """Reload the year's PriceTable and price the Ny lines that the tariff
+    triggers marked stale in the edit's transaction, so the change shows at
+    once. Should this fail, the lines stay stale until reprice_stale_lines
+    next runs; the lists price them per row meanwhile."""
+    if year in (None, ""):
+        return
+    reload_price_table(int(year))
+    reprice_stale_lines()
+
+
+def _refresh_stale_prisberegnet(conn):
+    """Price Ny lines that are new or changed since they were last priced."""
+    return _refresh_prisberegnet(conn, "PrisBeregnetTidspunkt IS NULL")
+
+
+def reprice_stale_lines():
+    """Write PrisBeregnet for every stale Ny line. Runs on the write side
+    only — after tariff edits, after a refresh (_run_refresh_job) and from
+    `flask --app app udeservering reprice` after the nightly robot run; the
+    read endpoints never write."""
+    with get_engine().begin() as conn:
+        return _refresh_stale_prisberegnet(conn)
+
+
+@udeservering_bp.cli.command("reprice")
+def reprice_stale_lines_command():
+    """Price stale Ny lines: flask --app app udeservering reprice"""
+    click.echo(f"{reprice_stale_lines()} fakturalinjer prissat.")
+
+
+def _with_effective_prices(rows):
+    """Expose the effective price as Pris on Ny rows, as the list views expect:
+    PrisBeregnet, or for a line not priced since its inputs changed, a live
+    price from beregn_pris_batch (nothing is written back). PrisBeregnet is
+    left as stored — sorting, totals and cursors follow it until the line is
+    repriced."""
+    ny = [r for r in rows if r.get("FakturaStatus") == "Ny"]
+    stale = [r for r in ny if r.get("PrisBeregnetTidspunkt") is None]
+    for r, pris in zip(stale, _price_fakturalinjer(stale)):
+        r["Pris"] = pris
+    for r in ny:
+        if r.get("PrisBeregnetTidspunkt") is not None:
+            pb = r.get("PrisBeregnet")
+            r["Pris"] = float(pb) if pb is not None else None
+    for r in rows:
+        r.pop("PrisBeregnetTidspunkt", None)
+    return rows
+
+
 @udeservering_bp.route("/api/beregn_pris", methods=["POST"])
 def api_beregn_pris():
     data = request.get_json() or {}
@@ -1008,13 +2290,38 @@ def api_beregn_pris():
     return jsonify({"success": result["ok"], "data": result})
 
 
+# ---------------------------------------------------------------------------
+#  Statistik rollup (sql/migrate_add_statistik_rollup.sql): line count and
+#  SUM(Pris) per (FakturaAar, FakturaPeriode, Serveringszone, Lokation,
+#  FakturaStatus), kept current by a trigger on fakturalinjer in the same
+#  transaction as every write. Per-firm figures (distinct firms, top
+#  tilladelser) can't be rolled up at this grain and still come from the lines.
+# ---------------------------------------------------------------------------
+STATISTIK_ROLLUP_TABLE = "BrugAarhus_Udeservering_StatistikRollup"
+
+
+def rebuild_statistik_rollup():
+    """Recompute the rollup from the fakturalinjer (after the nightly refresh)."""
+    with get_engine().begin() as conn:
+        conn.execute(text("EXEC dbo.usp_BrugAarhus_Udeservering_RebuildStatistikRollup"))
+
+
+@udeservering_bp.cli.command("rebuild-rollup")
+def rebuild_statistik_rollup_command():
+    """Rebuild the statistik rollup: flask --app app udeservering rebuild-rollup"""
+    rebuild_statistik_rollup()
+    click.echo("Statistik-rollup genopbygget.")
+
+
 @udeservering_bp.route("/api/statistik/metrics")
+@conditional_get("Tilladelser", "Fakturalinjer")
 def api_udeservering_statistik_metrics():
-    engine = get_engine()
-    with engine.begin() as conn:
-        stats = conn.execute(text("""
-            SELECT COALESCE(FakturaStatus, 'Ny') AS Status, COUNT(*) AS Cnt
-            FROM BrugAarhus_Udeservering_Fakturalinjer
+    engine = get_read_engine()
+    with engine.connect() as conn:
+        # Fakturalinje figures come from the rollup (see STATISTIK_ROLLUP_TABLE).
+        stats = conn.execute(text(f"""
+            SELECT COALESCE(FakturaStatus, 'Ny') AS Status, SUM(Antal) AS Cnt
+            FROM {STATISTIK_ROLLUP_TABLE}
             GROUP BY COALESCE(FakturaStatus, 'Ny')
         """)).mappings().all()
 
@@ -1023,29 +2330,29 @@ def api_udeservering_statistik_metrics():
             FROM BrugAarhus_Udeservering
         """)).mappings().first()
 
-        sum_pris = conn.execute(text("""
+        sum_pris = conn.execute(text(f"""
             SELECT
-                COALESCE(SUM(CASE WHEN FakturaStatus = 'Ny' THEN Pris END), 0) AS sum_ny,
-                COALESCE(SUM(CASE WHEN FakturaStatus = 'TilFakturering' THEN Pris END), 0) AS sum_tilfakt,
-                COALESCE(SUM(CASE WHEN FakturaStatus = 'Faktureret' THEN Pris END), 0) AS sum_faktureret
-            FROM BrugAarhus_Udeservering_Fakturalinjer
+                COALESCE(SUM(CASE WHEN FakturaStatus = 'Ny' THEN SumPris END), 0) AS sum_ny,
+                COALESCE(SUM(CASE WHEN FakturaStatus = 'TilFakturering' THEN SumPris END), 0) AS sum_tilfakt,
+                COALESCE(SUM(CASE WHEN FakturaStatus = 'Faktureret' THEN SumPris END), 0) AS sum_faktureret
+            FROM {STATISTIK_ROLLUP_TABLE}
         """)).mappings().first()
 
-        per_zone = conn.execute(text("""
+        per_zone = conn.execute(text(f"""
             SELECT Serveringszone AS Zone,
-                   COUNT(*) AS Cnt,
-                   COALESCE(SUM(Pris), 0) AS SumPris
-            FROM BrugAarhus_Udeservering_Fakturalinjer
+                   SUM(Antal) AS Cnt,
+                   COALESCE(SUM(SumPris), 0) AS SumPris
+            FROM {STATISTIK_ROLLUP_TABLE}
             WHERE Serveringszone IS NOT NULL AND Serveringszone <> ''
             GROUP BY Serveringszone
             ORDER BY Serveringszone
         """)).mappings().all()
 
-        per_year = conn.execute(text("""
+        per_year = conn.execute(text(f"""
             SELECT FakturaAar AS Year,
-                   COUNT(*) AS Cnt,
-                   COALESCE(SUM(Pris), 0) AS SumPris
-            FROM BrugAarhus_Udeservering_Fakturalinjer
+                   SUM(Antal) AS Cnt,
+                   COALESCE(SUM(SumPris), 0) AS SumPris
+            FROM {STATISTIK_ROLLUP_TABLE}
             GROUP BY FakturaAar
             ORDER BY FakturaAar DESC
         """)).mappings().all()
@@ -1074,19 +2381,26 @@ def api_udeservering_statistik_metrics():
 #  and the underlying detail rows. All grouped under a single query so a single
 #  filter change re-renders the entire dashboard.
 # ---------------------------------------------------------------------------
-def _statistik_filter_clause(args, params):
-    """Build the WHERE clause for the filtered statistik queries."""
-    where = ["1=1"]
-
+def _statistik_period_filter(args, where, params):
+    """Year / month filter on FakturaPeriode, shared by the line and rollup
+    queries so both count the same rows. An unknown month name is ignored."""
     year = args.get("year", "")
-    if year:
+    month_num = _month_num(args.get("month", ""))
+    if year and month_num:
+        where.append("FakturaPeriode = :periode")
+        params["periode"] = _periode(year, month_num)
+    elif year:
         where.append("FakturaAar = :year")
         params["year"] = int(year)
+    elif month_num:
+        where.append("FakturaPeriode % 100 = :month_num")
+        params["month_num"] = month_num
 
-    month = args.get("month", "")
-    if month:
-        where.append("FakturaMaaned = :month")
-        params["month"] = month
+
+def _statistik_filter_clause(args, params):
+    """Build the WHERE clause for the filtered statistik queries."""
+    where = ["1=1"]
+    _statistik_period_filter(args, where, params)
 
     status = args.get("status", "")
     if status:
@@ -1105,114 +2419,226 @@ def _statistik_filter_clause(args, params):
 
     search = args.get("search", "")
     if search:
-        where.append(
-            "(Firmanavn LIKE :search OR Adresse LIKE :search OR DeskproID LIKE :search OR CVR LIKE :search)"
-        )
-        params["search"] = f"%{search}%"
+        where.append(_search_clause(
+            "F", search, ("Firmanavn", "Adresse", "DeskproID", "CVR"), params,
+        ))
 
     return "WHERE " + " AND ".join(where)
 
 
-def _price_row(r):
-    """Return the effective Pris for a fakturalinje row, computing live for Ny lines."""
-    status_val = r.get("FakturaStatus")
-    if status_val in ("Faktureret", "TilFakturering", "FakturerIkke"):
-        # Stored price is authoritative once locked.
-        return float(r["Pris"]) if r.get("Pris") is not None else 0.0
-    # Ny rows: compute live.
-    month_num = MONTH_NAME_TO_NUM.get((r.get("FakturaMaaned") or "").split(" ")[0], 0)
-    try:
-        calc = beregn_pris(
-            r.get("Serveringszone"),
-            r.get("Lokation"),
-            float(r.get("Serveringsareal") or 0),
-            float(r.get("Facadelaengde") or 0),
-            month_num,
-            r.get("FakturaAar"),
-        )
-    except Exception:
-        return 0.0
-    return float(calc["belob"]) if calc.get("ok") else 0.0
+def _rollup_filter_clause(args, params):
+    """_statistik_filter_clause for the rollup table, or None when the filters
+    need the lines themselves (free-text search)."""
+    if args.get("search", ""):
+        return None
+
+    where = ["1=1"]
+    _statistik_period_filter(args, where, params)
+
+    for arg, col in (("status", "FakturaStatus"), ("zone", "Serveringszone"), ("lokation", "Lokation")):
+        value = args.get(arg, "")
+        if value:
+            where.append(f"{col} = :{arg}")
+            params[arg] = value
+
+    return "WHERE " + " AND ".join(where)
+
+
+# Open lines in the statistik dashboard: pricing inputs plus the breakdown keys.
+STATISTIK_OPEN_COLUMNS = FAKTURALINJE_PRICING_COLUMNS + (
+    "DeskproID", "Firmanavn", "Adresse", "FakturaPeriode",
+)
+
+# Statuses whose stored Pris is final; every other line is priced live.
+LOCKED_STATUSES = ("Faktureret", "TilFakturering", "FakturerIkke")
+LOCKED_STATUSES_SQL = ", ".join(f"'{st}'" for st in LOCKED_STATUSES)
+
+
+def _effective_prices(rows):
+    """Effective Pris per fakturalinje row: stored Pris once locked, live for Ny lines."""
+    prices = [0.0] * len(rows)
+    live_idx = []
+    for i, r in enumerate(rows):
+        if r.get("FakturaStatus") in LOCKED_STATUSES:
+            # Stored price is authoritative once locked.
+            prices[i] = float(r["Pris"]) if r.get("Pris") is not None else 0.0
+        else:
+            live_idx.append(i)
+    # Ny rows: compute live, all in one batch.
+    live = _price_fakturalinjer([rows[i] for i in live_idx])
+    for i, pris in zip(live_idx, live):
+        prices[i] = float(pris) if pris is not None else 0.0
+    return prices
 
 
 @udeservering_bp.route("/api/statistik/filtered")
+@conditional_get("Fakturalinjer", "Takster")
 def api_statistik_filtered():
-    """Single dashboard endpoint: returns KPIs, breakdowns, monthly trend, and top tilladelser."""
-    engine = get_engine()
+    """Single dashboard endpoint: returns KPIs, breakdowns, monthly trend, and top tilladelser.
+
+    Locked lines are aggregated in SQL — from the statistik rollup unless a
+    free-text search needs the lines, otherwise one GROUPING SETS query over
+    their stored Pris; only the open lines are fetched and priced in Python.
+    The two are merged per breakdown, so the cost follows the number of open
+    lines rather than the whole history."""
+    engine = get_read_engine()
     params = {}
     where_sql = _statistik_filter_clause(request.args, params)
+    rollup_where = _rollup_filter_clause(request.args, params)
+
+    with engine.connect() as conn:
+        if rollup_where is not None:
+            # Line-level breakdowns from the rollup; only the per-firm
+            # grouping has to read the locked lines.
+            locked_groups = conn.execute(text(f"""
+                SELECT
+                    FakturaStatus, Serveringszone, Lokation, FakturaPeriode,
+                    NULL AS DeskproID,
+                    GROUPING(FakturaStatus)  AS g_status,
+                    GROUPING(Serveringszone) AS g_zone,
+                    GROUPING(Lokation)       AS g_lokation,
+                    GROUPING(FakturaPeriode) AS g_periode,
+                    1                        AS g_firm,
+                    COALESCE(SUM(Antal), 0) AS cnt,
+                    COALESCE(SUM(SumPris), 0) AS sum_pris,
+                    NULL AS Firmanavn,
+                    NULL AS Adresse
+                FROM {STATISTIK_ROLLUP_TABLE}
+                {rollup_where}
+                  AND FakturaStatus IN ({LOCKED_STATUSES_SQL})
+                GROUP BY GROUPING SETS (
+                    (FakturaStatus), (Serveringszone), (Lokation), (FakturaPeriode), ()
+                )
+            """), params).mappings().all()
+            locked_groups += conn.execute(text(f"""
+                SELECT
+                    NULL AS FakturaStatus, NULL AS Serveringszone, NULL AS Lokation,
+                    NULL AS FakturaPeriode, DeskproID,
+                    1 AS g_status, 1 AS g_zone, 1 AS g_lokation, 1 AS g_periode, 0 AS g_firm,
+                    COUNT(*) AS cnt,
+                    COALESCE(SUM(Pris), 0) AS sum_pris,
+                    MIN(Firmanavn) AS Firmanavn,
+                    MIN(Adresse) AS Adresse
+                FROM BrugAarhus_Udeservering_Fakturalinjer
+                {where_sql}
+                  AND FakturaStatus IN ({LOCKED_STATUSES_SQL})
+                GROUP BY DeskproID
+            """), params).mappings().all()
+        else:
+            locked_groups = conn.execute(text(f"""
+                SELECT
+                    FakturaStatus, Serveringszone, Lokation, FakturaPeriode, DeskproID,
+                    GROUPING(FakturaStatus)  AS g_status,
+                    GROUPING(Serveringszone) AS g_zone,
+                    GROUPING(Lokation)       AS g_lokation,
+                    GROUPING(FakturaPeriode) AS g_periode,
+                    GROUPING(DeskproID)      AS g_firm,
+                    COUNT(*) AS cnt,
+                    COALESCE(SUM(Pris), 0) AS sum_pris,
+                    MIN(Firmanavn) AS Firmanavn,
+                    MIN(Adresse) AS Adresse
+                FROM BrugAarhus_Udeservering_Fakturalinjer
+                {where_sql}
+                  AND FakturaStatus IN ({LOCKED_STATUSES_SQL})
+                GROUP BY GROUPING SETS (
+                    (FakturaStatus), (Serveringszone), (Lokation), (FakturaPeriode), (DeskproID), ()
+                )
+            """), params).mappings().all()
 
-    with engine.begin() as conn:
-        rows = [
+        open_rows = [
             dict(r)
             for r in conn.execute(text(f"""
-                SELECT *
+                SELECT {_select_list(STATISTIK_OPEN_COLUMNS)}
                 FROM BrugAarhus_Udeservering_Fakturalinjer
                 {where_sql}
+                  AND (FakturaStatus IS NULL OR FakturaStatus NOT IN ({LOCKED_STATUSES_SQL}))
             """), params).mappings().all()
         ]
 
-    # Compute live price for each row (needed because Ny rows have NULL Pris in DB).
-    for r in rows:
-        r["EffectivePris"] = _price_row(r)
+    _metric_add("rows_fetched", len(locked_groups) + len(open_rows))
+
+    # Price the open lines live (Ny rows have no final Pris in DB).
+    for r, pris in zip(open_rows, _effective_prices(open_rows)):
+        r["EffectivePris"] = pris
+
+    # dimension -> key -> {"count", "sum"}; locked groups and open rows
+    # feed the same accumulators.
+    agg = {dim: {} for dim in ("status", "zone", "lokation", "month", "firm")}
+    firms = {}   # DeskproID -> (Firmanavn, Adresse) for the top list
+
+    def _add(dim, key, count, amount):
+        cur = agg[dim].setdefault(key, {"count": 0, "sum": 0.0})
+        cur["count"] += count
+        cur["sum"] += amount
+
+    total_rows = 0
+    total_sum = 0.0
+    for g in locked_groups:
+        count, amount = g["cnt"], float(g["sum_pris"] or 0)
+        if not g["g_status"]:
+            _add("status", g["FakturaStatus"] or "Ukendt", count, amount)
+        elif not g["g_zone"]:
+            _add("zone", g["Serveringszone"] or "Ukendt", count, amount)
+        elif not g["g_lokation"]:
+            _add("lokation", g["Lokation"] or "Ukendt", count, amount)
+        elif not g["g_periode"]:
+            if g["FakturaPeriode"]:
+                _add("month", g["FakturaPeriode"], count, amount)
+        elif not g["g_firm"]:
+            _add("firm", g["DeskproID"], count, amount)
+            firms.setdefault(g["DeskproID"], (g["Firmanavn"] or "", g["Adresse"] or ""))
+        else:
+            total_rows += count
+            total_sum += amount
+
+    for r in open_rows:
+        amount = r["EffectivePris"]
+        total_rows += 1
+        total_sum += amount
+        _add("status", r.get("FakturaStatus") or "Ukendt", 1, amount)
+        _add("zone", r.get("Serveringszone") or "Ukendt", 1, amount)
+        _add("lokation", r.get("Lokation") or "Ukendt", 1, amount)
+        if r.get("FakturaPeriode"):
+            _add("month", r["FakturaPeriode"], 1, amount)
+        _add("firm", r.get("DeskproID"), 1, amount)
+        firms.setdefault(r.get("DeskproID"), (r.get("Firmanavn") or "", r.get("Adresse") or ""))
 
     # ------- KPIs -------
-    total_rows = len(rows)
-    total_sum = sum(r["EffectivePris"] for r in rows)
-    unique_firms = len({r["DeskproID"] for r in rows})
+    unique_firms = len(agg["firm"])
     avg_pris = (total_sum / total_rows) if total_rows else 0.0
 
     # ------- Breakdowns -------
-    def _accum(key_fn):
-        agg = {}
-        for r in rows:
-            key = key_fn(r) or "Ukendt"
-            cur = agg.setdefault(key, {"count": 0, "sum": 0.0})
-            cur["count"] += 1
-            cur["sum"] += r["EffectivePris"]
+    def _breakdown(dim):
         return [
             {"key": k, "count": v["count"], "sum": v["sum"]}
-            for k, v in sorted(agg.items(), key=lambda kv: (-kv[1]["sum"], kv[0]))
+            for k, v in sorted(agg[dim].items(), key=lambda kv: (-kv[1]["sum"], kv[0]))
         ]
 
-    per_status = _accum(lambda r: r.get("FakturaStatus"))
-    per_zone = _accum(lambda r: r.get("Serveringszone"))
-    per_lokation = _accum(lambda r: r.get("Lokation"))
+    per_status = _breakdown("status")
+    per_zone = _breakdown("zone")
+    per_lokation = _breakdown("lokation")
 
-    # ------- Monthly trend: 12 months for the selected year if any,
-    #         otherwise the union of years in the filtered set.
-    # Build entries keyed by "YYYY-MM" so the chart can display them in order.
-    months_agg = {}
-    for r in rows:
-        m = MONTH_NAME_TO_NUM.get((r.get("FakturaMaaned") or "").split(" ")[0], 0)
-        y = r.get("FakturaAar") or 0
-        if not m or not y:
-            continue
-        key = f"{y}-{m:02d}"
-        cur = months_agg.setdefault(key, {"year": y, "month": m, "count": 0, "sum": 0.0})
-        cur["count"] += 1
-        cur["sum"] += r["EffectivePris"]
-    monthly = [
-        {"key": k, **v}
-        for k, v in sorted(months_agg.items())
-    ]
+    # ------- Monthly trend, keyed by "YYYY-MM" so the chart can display them in order.
+    monthly = []
+    for periode, v in sorted(agg["month"].items()):
+        y, m = divmod(periode, 100)
+        monthly.append({"key": f"{y}-{m:02d}", "year": y, "month": m, **v})
 
     # ------- Top 10 tilladelser by total amount (handy in monthly review).
-    top_agg = {}
-    for r in rows:
-        pid = r.get("DeskproID")
-        if not pid:
-            continue
-        cur = top_agg.setdefault(pid, {
-            "DeskproID": pid,
-            "Firmanavn": r.get("Firmanavn") or "",
-            "Adresse": r.get("Adresse") or "",
-            "count": 0,
-            "sum": 0.0,
-        })
-        cur["count"] += 1
-        cur["sum"] += r["EffectivePris"]
-    top_tilladelser = sorted(top_agg.values(), key=lambda x: -x["sum"])[:10]
+    top_tilladelser = sorted(
+        (
+            {
+                "DeskproID": pid,
+                "Firmanavn": firms[pid][0],
+                "Adresse": firms[pid][1],
+                "count": v["count"],
+                "sum": v["sum"],
+            }
+            for pid, v in agg["firm"].items()
+            if pid
+        ),
+        key=lambda x: (-x["sum"], x["DeskproID"]),
+    )[:10]
 
     return jsonify({
         "kpi": {
@@ -1232,47 +2658,43 @@ def api_statistik_filtered():
 @udeservering_bp.route("/api/statistik/filter_options")
 def api_statistik_filter_options():
     """Distinct values that populate the statistik filter dropdowns."""
-    engine = get_engine()
-    with engine.begin() as conn:
-        years = [r[0] for r in conn.execute(text("""
-            SELECT DISTINCT FakturaAar FROM BrugAarhus_Udeservering_Fakturalinjer
-            ORDER BY FakturaAar DESC
-        """)).fetchall()]
-        zones = [r[0] for r in conn.execute(text("""
-            SELECT DISTINCT Serveringszone FROM BrugAarhus_Udeservering_Fakturalinjer
-            WHERE Serveringszone IS NOT NULL AND Serveringszone <> ''
-            ORDER BY Serveringszone
-        """)).fetchall()]
-        lokationer = [r[0] for r in conn.execute(text("""
-            SELECT DISTINCT Lokation FROM BrugAarhus_Udeservering_Fakturalinjer
-            WHERE Lokation IS NOT NULL AND Lokation <> ''
-            ORDER BY Lokation
-        """)).fetchall()]
-    return jsonify({"years": years, "zones": zones, "lokationer": lokationer})
+    return jsonify(_cached_filter_options("fakturalinjer", "Fakturalinjer", _load_fakturalinje_filter_options))
+
+
+EXPORT_CHUNK_ROWS = 2000   # rows fetched and priced per round when streaming an export
+
+
+def _iter_export_chunks(engine, where_sql, params):
+    """Yield the filtered fakturalinjer in chunks of EXPORT_CHUNK_ROWS dicts,
+    each with EffectivePris set. Uses a server-side cursor, so only one chunk
+    is held in memory at a time."""
+    with engine.connect() as conn:
+        result = conn.execution_options(
+            stream_results=True, yield_per=EXPORT_CHUNK_ROWS,
+        ).execute(text(f"""
+            SELECT {_select_list(EXPORT_SELECT_COLUMNS)}
+            FROM BrugAarhus_Udeservering_Fakturalinjer
+            {where_sql}
+            ORDER BY FakturaDatoSort, FakturaLinjeID
+        """), params)
+        for partition in result.mappings().partitions():
+            rows = [dict(r) for r in partition]
+            _metric_add("rows_fetched", len(rows))
+            for r, pris in zip(rows, _effective_prices(rows)):
+                r["EffectivePris"] = pris
+            yield rows
 
 
 @udeservering_bp.route("/api/statistik/csv")
 def api_statistik_csv():
     """Export the filtered fakturalinjer as CSV in Danish locale:
        ';' as field separator, ',' as decimal, dates as dd-mm-yyyy.
-       Returns a BOM-prefixed UTF-8 file so Excel opens it cleanly."""
-    engine = get_engine()
+       Returns a BOM-prefixed UTF-8 file so Excel opens it cleanly.
+       The file is streamed chunk by chunk as rows come off the cursor."""
+    engine = get_read_engine()
     params = {}
     where_sql = _statistik_filter_clause(request.args, params)
 
-    with engine.begin() as conn:
-        rows = [
-            dict(r)
-            for r in conn.execute(text(f"""
-                SELECT *
-                FROM BrugAarhus_Udeservering_Fakturalinjer
-                {where_sql}
-                ORDER BY FakturaDatoSort, FakturaLinjeID
-            """), params).mappings().all()
-        ]
-    for r in rows:
-        r["EffectivePris"] = _price_row(r)
-
     def _da_num(v, decimals=2):
         if v is None or v == "":
             return ""
@@ -1288,61 +2710,368 @@ def api_statistik_csv():
             return v.strftime("%d-%m-%Y")
         return str(v)
 
-    buf = io.StringIO()
-    buf.write("﻿")  # UTF-8 BOM so Excel auto-detects encoding
-    writer = csv.writer(buf, delimiter=";", quoting=csv.QUOTE_MINIMAL, lineterminator="\r\n")
+    def generate():
+        buf = io.StringIO()
+        writer = csv.writer(buf, delimiter=";", quoting=csv.QUOTE_MINIMAL, lineterminator="\r\n")
 
-    writer.writerow([
-        "FakturaLinjeID", "DeskproID", "Firmanavn", "Att", "Adresse",
-        "CVR", "Zone", "Lokation", "Areal (m²)", "Facade (m)",
-        "Periode", "FakturaAar", "Pris (kr)", "Status", "Kommentar",
-        "Ansøgningsdato",
-    ])
-    for r in rows:
+        def _flush():
+            out = buf.getvalue()
+            buf.seek(0)
+            buf.truncate(0)
+            return out
+
+        buf.write("\ufeff")  # UTF-8 BOM so Excel auto-detects encoding
         writer.writerow([
-            r.get("FakturaLinjeID") or "",
-            r.get("DeskproID") or "",
-            r.get("Firmanavn") or "",
-            r.get("Att") or "",
-            r.get("Adresse") or "",
-            r.get("CVR") or "",
-            r.get("Serveringszone") or "",
-            r.get("Lokation") or "",
-            _da_num(r.get("Serveringsareal")),
-            _da_num(r.get("Facadelaengde")),
-            r.get("FakturaMaaned") or "",
-            r.get("FakturaAar") or "",
-            _da_num(r.get("EffectivePris")),
-            r.get("FakturaStatus") or "",
-            (r.get("Kommentar") or "").replace("\r", " ").replace("\n", " "),
-            _da_date(r.get("Ansogningsdato")),
+            "FakturaLinjeID", "DeskproID", "Firmanavn", "Att", "Adresse",
+            "CVR", "Zone", "Lokation", "Areal (m²)", "Facade (m)",
+            "Periode", "FakturaAar", "Pris (kr)", "Status", "Kommentar",
+            "Ansøgningsdato",
         ])
+        yield _flush()
+
+        for rows in _iter_export_chunks(engine, where_sql, params):
+            for r in rows:
+                writer.writerow([
+                    r.get("FakturaLinjeID") or "",
+                    r.get("DeskproID") or "",
+                    r.get("Firmanavn") or "",
+                    r.get("Att") or "",
+                    r.get("Adresse") or "",
+                    r.get("CVR") or "",
+                    r.get("Serveringszone") or "",
+                    r.get("Lokation") or "",
+                    _da_num(r.get("Serveringsareal")),
+                    _da_num(r.get("Facadelaengde")),
+                    r.get("FakturaMaaned") or "",
+                    r.get("FakturaAar") or "",
+                    _da_num(r.get("EffectivePris")),
+                    r.get("FakturaStatus") or "",
+                    (r.get("Kommentar") or "").replace("\r", " ").replace("\n", " "),
+                    _da_date(r.get("Ansogningsdato")),
+                ])
+            yield _flush()
 
     today = datetime.date.today().isoformat()
     filename = f"BrugAarhus_statistik_{today}.csv"
     return Response(
-        buf.getvalue(),
+        stream_with_context(generate()),
         mimetype="text/csv; charset=utf-8",
         headers={"Content-Disposition": f'attachment; filename="{filename}"'},
     )
 
 
+# (header, row key, type) for the typed exports — same columns as the CSV.
+EXPORT_COLUMNS = [
+    ("FakturaLinjeID", "FakturaLinjeID", "int"),
+    ("DeskproID", "DeskproID", "int"),
+    ("Firmanavn", "Firmanavn", "text"),
+    ("Att", "Att", "text"),
+    ("Adresse", "Adresse", "text"),
+    ("CVR", "CVR", "text"),
+    ("Zone", "Serveringszone", "text"),
+    ("Lokation", "Lokation", "text"),
+    ("Areal (m²)", "Serveringsareal", "num"),
+    ("Facade (m)", "Facadelaengde", "num"),
+    ("Periode", "FakturaMaaned", "text"),
+    ("FakturaAar", "FakturaAar", "int"),
+    ("Pris (kr)", "EffectivePris", "num"),
+    ("Status", "FakturaStatus", "text"),
+    ("Kommentar", "Kommentar", "text"),
+    ("Ansøgningsdato", "Ansogningsdato", "date"),
+]
+
+# What the exports read: the exported columns plus the pricing inputs.
+EXPORT_SELECT_COLUMNS = tuple(dict.fromkeys(
+    [key for _, key, _ in EXPORT_COLUMNS if key != "EffectivePris"]
+    + list(FAKTURALINJE_PRICING_COLUMNS)
+))
+
+EXPORT_MIMETYPES = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def _export_value(v, kind):
+    """Coerce a DB value to the column's export type; None stays None."""
+    if v is None or v == "":
+        return None
+    try:
+        if kind == "int":
+            return int(v)
+        if kind == "num":
+            return float(v)
+        if kind == "date":
+            if isinstance(v, datetime.datetime):
+                return v.date()
+            if isinstance(v, datetime.date):
+                return v
+            return datetime.date.fromisoformat(str(v)[:10])
+    except (TypeError, ValueError):
+        return None
+    return str(v)
+
+
+def _write_xlsx(chunks, fileobj):
+    """One sheet, rows flushed to disk as they are written (constant_memory)."""
+    wb = xlsxwriter.Workbook(fileobj, {"constant_memory": True})
+    ws = wb.add_worksheet("Fakturalinjer")
+    header_fmt = wb.add_format({"bold": True})
+    num_fmt = wb.add_format({"num_format": "#,##0.00"})
+    date_fmt = wb.add_format({"num_format": "dd-mm-yyyy"})
+
+    ws.freeze_panes(1, 0)
+    ws.write_row(0, 0, [h for h, _, _ in EXPORT_COLUMNS], header_fmt)
+    row_no = 1
+    for rows in chunks:
+        for r in rows:
+            for col, (_, key, kind) in enumerate(EXPORT_COLUMNS):
+                v = _export_value(r.get(key), kind)
+                if v is None:
+                    continue
+                if kind == "num":
+                    ws.write_number(row_no, col, v, num_fmt)
+                elif kind == "int":
+                    ws.write_number(row_no, col, v)
+                elif kind == "date":
+                    ws.write_datetime(row_no, col, datetime.datetime.combine(v, datetime.time()), date_fmt)
+                else:
+                    ws.write_string(row_no, col, v)
+            row_no += 1
+    wb.close()
+
+
+def _write_parquet(chunks, fileobj):
+    """One row group per chunk, typed columns."""
+    types = {"int": pa.int64(), "num": pa.float64(), "date": pa.date32(), "text": pa.string()}
+    schema = pa.schema([(h, types[kind]) for h, _, kind in EXPORT_COLUMNS])
+    with pq.ParquetWriter(fileobj, schema) as writer:
+        for rows in chunks:
+            arrays = [
+                pa.array([_export_value(r.get(key), kind) for r in rows], type=types[kind])
+                for _, key, kind in EXPORT_COLUMNS
+            ]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+
+
+def _export_file_response(fmt, chunks, basename):
+    """Write `chunks` (from _iter_export_chunks) to a temp file as XLSX or
+    Parquet and send it as a download."""
+    if fmt == "xlsx":
+        if xlsxwriter is None:
+            return jsonify({"success": False, "error": "XLSX-eksport kræver pakken xlsxwriter"}), 501
+        write = _write_xlsx
+    elif fmt == "parquet":
+        if pa is None:
+            return jsonify({"success": False, "error": "Parquet-eksport kræver pakken pyarrow"}), 501
+        write = _write_parquet
+    else:
+        return jsonify({"success": False, "error": "Ugyldigt format"}), 400
+
+    tmp = tempfile.TemporaryFile()
+    try:
+        write(chunks, tmp)
+        tmp.seek(0)
+    except Exception:
+        tmp.close()
+        raise
+
+    today = datetime.date.today().isoformat()
+    return send_file(
+        tmp,
+        mimetype=EXPORT_MIMETYPES[fmt],
+        as_attachment=True,
+        download_name=f"{basename}_{today}.{fmt}",
+    )
+
+
+@udeservering_bp.route("/api/statistik/export")
+def api_statistik_export():
+    """The CSV export's rows as `format=xlsx` or `format=parquet`, typed
+    (numbers, dates) instead of Danish-formatted text."""
+    fmt = request.args.get("format", "xlsx").lower()
+    engine = get_read_engine()
+    params = {}
+    where_sql = _statistik_filter_clause(request.args, params)
+    return _export_file_response(
+        fmt, _iter_export_chunks(engine, where_sql, params), "BrugAarhus_statistik",
+    )
+
+
+@udeservering_bp.route("/metrics")
+def metrics():
+    return Response(_render_metrics(), mimetype="text/plain; version=0.0.4")
+
+
+@udeservering_bp.route("/api/pool")
+def api_pool():
+    """Connection pool state of this worker: size, connections checked out,
+    overflow in use, and — with app.py's TimedQueuePool — checkout counts and
+    how long requests waited for a connection."""
+    pool = get_engine().pool
+    result = {"status": pool.status()}
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        fn = getattr(pool, name, None)
+        if callable(fn):
+            result[name] = fn()
+    if hasattr(pool, "stats"):
+        result.update(pool.stats())
+    return jsonify(result)
+
+
+# ---------------------------------------------------------------------------
+#  Refresh ("Synkroniser"). POST /api/run_refresh records a job in
+#  REFRESH_JOB_TABLE (sql/migrate_add_refresh_jobs.sql) and returns its id
+#  at once; a background thread triggers the refresh robot through the
+#  orchestrator (pooled session, timeouts, retries) and then watches the
+#  data version counters. Once Tilladelser / Fakturalinjer have changed and
+#  stayed put for REFRESH_SETTLE_SECONDS the robot is taken to be done and
+#  the caches over those tables are dropped. Any worker can answer
+#  GET /api/run_refresh/<id>. PyOrchestratorURL points the trigger
+#  elsewhere, e.g. at tools/stub_orchestrator.py for local runs.
+# ---------------------------------------------------------------------------
+ORCHESTRATOR_URL = os.getenv("PyOrchestratorURL", "https://pyorchestrator.aarhuskommune.dk/api/trigger")
+ORCHESTRATOR_TIMEOUT = (5, 30)   # connect, read (seconds)
+ORCHESTRATOR_RETRIES = 3         # on connection errors and 502/503/504, with backoff
+
+REFRESH_JOB_TABLE = "BrugAarhus_Udeservering_RefreshJob"
+REFRESH_SOURCES = ("Tilladelser", "Fakturalinjer")
+REFRESH_POLL_SECONDS = 5
+REFRESH_SETTLE_SECONDS = 30      # no writes for this long = robot finished
+REFRESH_WAIT_SECONDS = 15 * 60   # stop watching after this
+REFRESH_ACTIVE = ("queued", "triggered", "refreshing")
+REFRESH_FINISHED = ("done", "timeout", "failed")
+
+_orchestrator_session = None
+_orchestrator_session_lock = threading.Lock()
+
+
+def get_orchestrator_session():
+    """Shared requests.Session with a small connection pool and retries."""
+    global _orchestrator_session
+    if _orchestrator_session is None:
+        with _orchestrator_session_lock:
+            if _orchestrator_session is None:
+                retry = Retry(
+                    total=ORCHESTRATOR_RETRIES,
+                    backoff_factor=0.5,
+                    status_forcelist=(502, 503, 504),
+                    # Setting the trigger to IDLE twice is harmless.
+                    allowed_methods=frozenset({"POST"}),
+                )
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=4, max_retries=retry)
+                session = requests.Session()
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _orchestrator_session = session
+    return _orchestrator_session
+
+
+def _set_refresh_job(job_id, status, http_status=None, resultat=None):
+    with get_engine().begin() as conn:
+        conn.execute(text(f"""
+            UPDATE {REFRESH_JOB_TABLE}
+            SET Status     = :status,
+                Opdateret  = SYSDATETIME(),
+                HttpStatus = COALESCE(:http_status, HttpStatus),
+                Resultat   = COALESCE(:resultat, Resultat)
+            WHERE JobId = :job_id
+        """), {"job_id": job_id, "status": status, "http_status": http_status, "resultat": resultat})
+
+
+def _refresh_versions():
+    versions = _data_versions()
+    return [versions.get(name) for name in REFRESH_SOURCES]
+
+
+def _run_refresh_job(app, job_id):
+    """Background thread: trigger the robot, wait for its writes to settle,
+    then invalidate the caches that depend on the refreshed tables."""
+    with app.app_context():
+        try:
+            before = _refresh_versions()
+            r = get_orchestrator_session().post(
+                ORCHESTRATOR_URL,
+                json={
+                    "trigger_name": "BrugAarhusRefreshWebsiteTrigger",
+                    "process_status": "IDLE",
+                },
+                headers={"X-API-Key": os.getenv("PyOrchestratorAPIKey")},
+                timeout=ORCHESTRATOR_TIMEOUT,
+            )
+            if not r.ok:
+                _set_refresh_job(job_id, "failed", r.status_code, r.text)
+                return
+            _set_refresh_job(job_id, "triggered", r.status_code, r.text)
+
+            changed_at = None
+            deadline = time.monotonic() + REFRESH_WAIT_SECONDS
+            while time.monotonic() < deadline:
+                time.sleep(REFRESH_POLL_SECONDS)
+                versions = _refresh_versions()
+                if versions != before:
+                    if changed_at is None:
+                        _set_refresh_job(job_id, "refreshing")
+                    before = versions
+                    changed_at = time.monotonic()
+                elif changed_at is not None and time.monotonic() - changed_at >= REFRESH_SETTLE_SECONDS:
+                    break
+
+            # Price and index the robot's new and changed rows here, not on the next read.
+            reprice_stale_lines()
+            refresh_search_index()
+            # Price tables, ETags and filter options follow their version counters.
+            _set_refresh_job(job_id, "done" if changed_at is not None else "timeout")
+        except Exception as e:
+            log.exception("run_refresh job %s failed", job_id)
+            _set_refresh_job(job_id, "failed", resultat=str(e))
+
+
 @udeservering_bp.route("/api/run_refresh", methods=["POST"])
 def api_run_refresh():
-    url = "https://pyorchestrator.aarhuskommune.dk/api/trigger"
+    """Start a refresh, or join the one already running; returns the job id."""
+    job_id = uuid.uuid4().hex
+
+    with get_engine().begin() as conn:
+        active = conn.execute(text(f"""
+            SELECT TOP 1 JobId, Status
+            FROM {REFRESH_JOB_TABLE} WITH (UPDLOCK, HOLDLOCK)
+            WHERE Status IN ({", ".join(f"'{status}'" for status in REFRESH_ACTIVE)})
+              AND Opdateret > DATEADD(second, -:max_age, SYSDATETIME())
+            ORDER BY Oprettet DESC
+        """), {
+            # A job whose worker died stops blocking new ones.
+            "max_age": REFRESH_WAIT_SECONDS + 60,
+        }).mappings().first()
+        if active is not None:
+            return jsonify({"success": True, "job_id": active["JobId"], "status": active["Status"]}), 202
 
-    payload = {
-        "trigger_name": "BrugAarhusRefreshWebsiteTrigger",
-        "process_status": "IDLE"
-    }
+        conn.execute(text(f"""
+            INSERT INTO {REFRESH_JOB_TABLE} (JobId, Status)
+            VALUES (:job_id, 'queued')
+        """), {"job_id": job_id})
 
-    headers = {
-        "Content-Type": "application/json",
-        "X-API-Key": os.getenv("PyOrchestratorAPIKey")
-    }
+    threading.Thread(
+        target=_run_refresh_job,
+        args=(current_app._get_current_object(), job_id),
+        name=f"run-refresh-{job_id[:8]}",
+        daemon=True,
+    ).start()
+    return jsonify({"success": True, "job_id": job_id, "status": "queued"}), 202
+
+
+@udeservering_bp.route("/api/run_refresh/<job_id>")
+def api_run_refresh_status(job_id):
+    with get_read_engine().connect() as conn:
+        job = conn.execute(text(f"""
+            SELECT JobId, Status, Oprettet, Opdateret, HttpStatus, Resultat
+            FROM {REFRESH_JOB_TABLE}
+            WHERE JobId = :job_id
+        """), {"job_id": job_id}).mappings().first()
 
-    r = requests.post(url, json=payload, headers=headers)
-    return jsonify({"success": True, "result": r.json()}), r.status_code
+    if job is None:
+        return jsonify({"success": False, "error": "Ukendt job."}), 404
+    return jsonify({"success": True, "finished": job["Status"] in REFRESH_FINISHED, "job": dict(job)})
 
 
 @udeservering_bp.route("/api/year/clone", methods=["POST"])
@@ -1380,4 +3109,7 @@ def api_clone_year():
             WHERE [Year] = :last_year
         """), {"new_year": new_year, "last_year": last_year})
 
+    # Ny lines the robot already made for the new year were priced without
+    # takster (PrisBeregnet NULL); price them now.
+    _tariffs_changed(new_year)
     return jsonify({"success": True, "new_year": new_year})